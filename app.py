@@ -24,6 +24,7 @@ from blueprints.r2v import r2v_bp
 from blueprints.asset import asset_bp
 from blueprints.project import project_bp
 from blueprints.voice import voice_bp
+from core.utils.json_provider import OrjsonProvider
 # from core.blueprints.health import health_bp  # 可选：健康检查（需要安装psutil）
 
 
@@ -31,6 +32,9 @@ from blueprints.voice import voice_bp
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# 使用 orjson 加速 jsonify / request.get_json
+app.json = OrjsonProvider(app)
+
 # 初始化应用，创建必要的目录结构
 Config.init_app(app)
 
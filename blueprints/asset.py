@@ -6,9 +6,9 @@
 from flask import Blueprint, render_template, request, jsonify, session, make_response, send_file
 import os
 import time
-import uuid
+import secrets
 import json
-import subprocess
+from types import MappingProxyType
 
 from config import Config
 from core.utils.session_helper import get_api_key_hash, require_auth
@@ -17,60 +17,59 @@ from core.services.file_service import FileService
 from core.services.project_service import ProjectService
 from core.handlers.media_handler import MediaHandler
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        """序列化为带缩进的UTF-8 JSON字节串"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        """序列化为带缩进的UTF-8 JSON字节串"""
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
 
 # 创建蓝图
 asset_bp = Blueprint('asset', __name__)
 
-
-def generate_asset_video_poster(video_path: str, poster_path: str) -> bool:
-    """为资产视频生成封面图
-    
-    Args:
-        video_path: 视频文件路径
-        poster_path: 封面图输出路径
-        
-    Returns:
-        是否成功
-    """
-    if os.path.exists(poster_path):
-        return True  # 已存在
-    
+# 资产分类 -> 资产目录 (导入时构建一次，避免每次请求重建字典)
+_ASSET_DIRS = MappingProxyType({
+    'storyboard': Config.ASSETS_STORYBOARD_DIR,
+    'artwork': Config.ASSETS_ARTWORK_DIR,
+    'video': Config.ASSETS_VIDEO_DIR
+})
+
+# 资产可复制到的任务上传目录
+_ASSET_TARGET_UPLOAD_DIRS = MappingProxyType({
+    'i2v': Config.UPLOAD_I2V_DIR,
+    'kf2v': Config.UPLOAD_KF2V_DIR,
+    'i2i': Config.UPLOAD_I2I_DIR
+})
+
+# 可保存为资产的任务输出目录
+_ASSET_SOURCE_OUTPUT_DIRS = MappingProxyType({
+    'i2v': Config.OUTPUT_I2V_DIR,
+    'kf2v': Config.OUTPUT_KF2V_DIR,
+    't2i': Config.OUTPUT_T2I_DIR,
+    'i2i': Config.OUTPUT_I2I_DIR,
+    't2v': Config.OUTPUT_T2V_DIR,
+    'r2v': Config.OUTPUT_R2V_DIR
+})
+
+
+def _entry_size(entry):
+    """获取目录项的文件大小，文件已被删除时返回 0"""
     try:
-        # 确保目录存在
-        os.makedirs(os.path.dirname(poster_path), exist_ok=True)
-        
-        # 使用 ffmpeg 提取第0.5秒的帧作为封面
-        cmd = [
-            'ffmpeg',
-            '-ss', '0.5',
-            '-i', video_path,
-            '-vframes', '1',
-            '-vf', 'scale=-1:360',  # 缩放高度为360px，减小文件体积
-            '-q:v', '3',  # 高质量JPEG
-            '-y',  # 覆盖已存在的文件
-            poster_path
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            timeout=30
-        )
-        
-        if result.returncode == 0 and os.path.exists(poster_path):
-            print(f"[INFO] 资产视频封面生成成功: {poster_path}")
-            return True
-        else:
-            error_msg = result.stderr.decode('utf-8', errors='ignore')
-            print(f"[ERROR] 资产视频封面生成失败: {error_msg[:200]}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        print(f"[ERROR] ffmpeg超时: {video_path}")
-        return False
-    except Exception as e:
-        print(f"[ERROR] 生成资产视频封面异常: {e}")
-        return False
+        return entry.stat().st_size
+    except FileNotFoundError:
+        return 0
 
 
 @asset_bp.route('/assets')
@@ -127,28 +126,17 @@ def upload_asset():
             
             # 生成新文件名
             timestamp = int(time.time())
-            unique_id = str(uuid.uuid4())[:8]
+            unique_id = secrets.token_hex(4)
             new_filename = f"{timestamp}_{unique_id}.{ext}" if ext else f"{timestamp}_{unique_id}"
             
             # 根据分类选择目录
-            category_dirs = {
-                'storyboard': Config.ASSETS_STORYBOARD_DIR,
-                'artwork': Config.ASSETS_ARTWORK_DIR,
-                'video': Config.ASSETS_VIDEO_DIR
-            }
-            base_dir = category_dirs[category]
+            base_dir = _ASSET_DIRS[category]
             user_dir = os.path.join(base_dir, api_key_hash)
             os.makedirs(user_dir, exist_ok=True)
             
             filepath = os.path.join(user_dir, new_filename)
             file.save(filepath)
             
-            # 同步到磁盘
-            try:
-                os.sync() if hasattr(os, 'sync') else None
-            except:
-                pass
-            
             # 保存元数据
             meta_filename = new_filename + '.meta.json'
             meta_path = os.path.join(user_dir, meta_filename)
@@ -159,8 +147,8 @@ def upload_asset():
                 'upload_time': time.strftime('%Y-%m-%d %H:%M:%S'),
                 'file_type': 'video' if category == 'video' else 'image'
             }
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, ensure_ascii=False, indent=2)
+            with open(meta_path, 'wb') as f:
+                f.write(_json_dumps(meta_data))
             
             # 如果是视频，生成封面图
             poster_url = None
@@ -168,7 +156,7 @@ def upload_asset():
                 poster_dir = os.path.join(user_dir, 'posters')
                 poster_filename = new_filename.rsplit('.', 1)[0] + '.jpg'
                 poster_path = os.path.join(poster_dir, poster_filename)
-                if generate_asset_video_poster(filepath, poster_path):
+                if MediaHandler.generate_video_poster(filepath, poster_path):
                     poster_url = f'/api/assets/video-poster/{api_key_hash}/{poster_filename}'
             
             # 添加到上传成功的文件列表
@@ -180,12 +168,6 @@ def upload_asset():
                 'category': category
             })
         
-        # 同步到磁盘
-        try:
-            os.sync() if hasattr(os, 'sync') else None
-        except:
-            pass
-        
         return jsonify({
             'success': True,
             'files': uploaded_files,
@@ -201,37 +183,29 @@ def upload_asset():
 def get_asset(category, api_key_hash, filename):
     """获取资产文件"""
     try:
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
-        base_dir = category_dirs.get(category)
+        base_dir = _ASSET_DIRS.get(category)
         if not base_dir:
             return jsonify({'error': '无效的资产分类'}), 400
         
         filepath = os.path.join(base_dir, api_key_hash, filename)
-        if not os.path.exists(filepath):
-            return jsonify({'error': '文件不存在'}), 404
         
         # 检测MIME类型
         ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
         
         if category == 'video':
-            # 视频使用Range请求
+            # 视频使用Range请求 (内部会检查文件是否存在)
             return MediaHandler.serve_video_with_range(filepath, 'video/mp4')
         else:
+            try:
+                st = os.stat(filepath)
+            except FileNotFoundError:
+                return jsonify({'error': '文件不存在'}), 404
+            
             # 图片直接返回
-            mime_types = {
-                'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
-                'png': 'image/png', 'webp': 'image/webp',
-                'bmp': 'image/bmp', 'gif': 'image/gif'
-            }
-            mimetype = mime_types.get(ext, 'image/png')
+            mimetype = MediaHandler.IMAGE_MIME_TYPES.get(ext, 'image/png')
             response = make_response(send_file(filepath, mimetype=mimetype))
             response.headers['Cache-Control'] = 'private, max-age=604800'
-            response.headers['ETag'] = f'"{os.path.getmtime(filepath)}-{os.path.getsize(filepath)}"'
+            response.headers['ETag'] = f'"{st.st_mtime}-{st.st_size}"'
             return response
     
     except Exception as e:
@@ -259,16 +233,18 @@ def get_asset_video_poster(api_key_hash, poster_filename):
                     break
             
             if video_path:
-                generate_asset_video_poster(video_path, poster_path)
+                MediaHandler.generate_video_poster(video_path, poster_path)
         
-        if os.path.exists(poster_path):
-            response = make_response(send_file(poster_path, mimetype='image/jpeg'))
-            response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
-            response.headers['ETag'] = f'"{os.path.getmtime(poster_path)}"'
-            return response
-        else:
+        try:
+            poster_mtime = os.stat(poster_path).st_mtime
+        except FileNotFoundError:
             # 封面图生成失败，返回404
             return jsonify({'error': '封面图不存在'}), 404
+        
+        response = make_response(send_file(poster_path, mimetype='image/jpeg'))
+        response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
+        response.headers['ETag'] = f'"{poster_mtime}"'
+        return response
             
     except Exception as e:
         print(f"[ERROR] 获取资产视频封面失败: {e}")
@@ -301,38 +277,34 @@ def list_assets():
         else:
             categories = [category]
         
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
         for cat in categories:
-            base_dir = category_dirs.get(cat)
+            base_dir = _ASSET_DIRS.get(cat)
             if not base_dir:
                 continue
             
             user_dir = os.path.join(base_dir, api_key_hash)
-            if not os.path.exists(user_dir):
+            try:
+                entries = list(os.scandir(user_dir))
+            except FileNotFoundError:
                 continue
             
-            for filename in os.listdir(user_dir):
-                if filename.endswith('.meta.json'):
+            for entry in entries:
+                filename = entry.name
+                # 跳过元数据文件（含原子写入的临时文件）
+                if filename.endswith(('.meta.json', '.meta.json.tmp')):
                     continue
                 
-                # 跳过 posters 目录
-                if filename == 'posters':
+                # 跳过 posters 等子目录（d_type 由 getdents 返回，无需额外 stat）
+                if entry.is_dir(follow_symlinks=False):
                     continue
                 
                 # 读取元数据
-                meta_path = os.path.join(user_dir, filename + '.meta.json')
                 meta = {}
-                if os.path.exists(meta_path):
-                    try:
-                        with open(meta_path, 'r', encoding='utf-8') as f:
-                            meta = json.load(f)
-                    except:
-                        pass
+                try:
+                    with open(entry.path + '.meta.json', 'rb') as f:
+                        meta = _json_loads(f.read())
+                except Exception:
+                    pass
                 
                 # 根据项目/分集筛选
                 asset_project = meta.get('project', '')
@@ -343,7 +315,6 @@ def list_assets():
                 if filter_episode and asset_episode != filter_episode:
                     continue
                 
-                filepath = os.path.join(user_dir, filename)
                 file_type = meta.get('file_type', 'image' if cat != 'video' else 'video')
                 
                 asset_data = {
@@ -353,7 +324,7 @@ def list_assets():
                     'url': f'/api/assets/{cat}/{api_key_hash}/{filename}',
                     'upload_time': meta.get('upload_time', ''),
                     'file_type': file_type,
-                    'file_size': os.path.getsize(filepath) if os.path.exists(filepath) else 0,
+                    'file_size': _entry_size(entry),
                     'project': asset_project,
                     'episode': asset_episode
                 }
@@ -403,13 +374,7 @@ def delete_asset():
         if not category or not filename:
             return error_response('缺少参数')
         
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
-        base_dir = category_dirs.get(category)
+        base_dir = _ASSET_DIRS.get(category)
         if not base_dir:
             return error_response('无效的资产分类')
         
@@ -453,39 +418,13 @@ def update_asset_tags():
         if not category or not filename:
             return error_response('缺少参数')
         
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
-        base_dir = category_dirs.get(category)
-        if not base_dir:
+        if category not in _ASSET_DIRS:
             return error_response('无效的资产分类')
         
-        user_dir = os.path.join(base_dir, api_key_hash)
-        meta_path = os.path.join(user_dir, filename + '.meta.json')
-        
-        # 读取现有元数据
-        meta_data = {}
-        if os.path.exists(meta_path):
-            with open(meta_path, 'r', encoding='utf-8') as f:
-                meta_data = json.load(f)
-        
-        # 更新标签
-        meta_data['project'] = project
-        meta_data['episode'] = episode
-        meta_data['filename'] = filename
-        meta_data['category'] = category
-        
-        # 保存元数据
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump(meta_data, f, ensure_ascii=False, indent=2)
-        
-        # 如果项目/分集不存在，自动添加到项目列表
-        if project:
-            project_service = ProjectService(api_key_hash)
-            project_service.ensure_project_and_episode(project, episode)
+        # 经由 ProjectService 写入，保证资产索引同步失效
+        success, message = ProjectService(api_key_hash).update_asset_tags(category, filename, project, episode)
+        if not success:
+            return error_response(message)
         
         return success_response('标签更新成功')
     
@@ -514,35 +453,24 @@ def copy_asset_to_upload():
         if category not in ['storyboard', 'artwork']:
             return error_response('只能从分镜库或原画库选择图片')
 
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR
-        }
-
-        target_dirs = {
-            'i2v': Config.UPLOAD_I2V_DIR,
-            'kf2v': Config.UPLOAD_KF2V_DIR,
-            'i2i': Config.UPLOAD_I2I_DIR
-        }
-
-        source_dir = os.path.join(category_dirs[category], api_key_hash)
+        source_dir = os.path.join(_ASSET_DIRS[category], api_key_hash)
         source_path = os.path.join(source_dir, filename)
 
         if not os.path.exists(source_path):
             return error_response('源文件不存在')
 
-        target_base_dir = target_dirs.get(target_type, Config.UPLOAD_I2V_DIR)
+        target_base_dir = _ASSET_TARGET_UPLOAD_DIRS.get(target_type, Config.UPLOAD_I2V_DIR)
         target_dir = os.path.join(target_base_dir, api_key_hash)
         os.makedirs(target_dir, exist_ok=True)
 
         # 生成新文件名
         ext = filename.rsplit('.', 1)[-1] if '.' in filename else 'png'
         timestamp = int(time.time())
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = secrets.token_hex(4)
         new_filename = f"{timestamp}_{unique_id}.{ext}"
 
         target_path = os.path.join(target_dir, new_filename)
-        shutil.copy2(source_path, target_path)
+        shutil.copyfile(source_path, target_path)
 
         # 构建URL
         url_prefixes = {
@@ -586,13 +514,7 @@ def save_to_asset_library():
         if file_type == 'image' and target_category == 'video':
             return error_response('图片不能保存到视频库')
 
-        target_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-
-        target_base_dir = target_dirs.get(target_category)
+        target_base_dir = _ASSET_DIRS.get(target_category)
         if not target_base_dir:
             return error_response('无效的目标分类')
 
@@ -609,7 +531,7 @@ def save_to_asset_library():
         
         # 生成新文件名
         timestamp = int(time.time())
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = secrets.token_hex(4)
         
         if is_remote_url:
             # 从远程URL下载文件
@@ -641,16 +563,7 @@ def save_to_asset_library():
                 return error_response(f'下载图片失败: {str(e)}')
         else:
             # 本地文件复制
-            source_dirs = {
-                'i2v': Config.OUTPUT_I2V_DIR,
-                'kf2v': Config.OUTPUT_KF2V_DIR,
-                't2i': Config.OUTPUT_T2I_DIR,
-                'i2i': Config.OUTPUT_I2I_DIR,
-                't2v': Config.OUTPUT_T2V_DIR,
-                'r2v': Config.OUTPUT_R2V_DIR
-            }
-            
-            source_base_dir = source_dirs.get(source_type)
+            source_base_dir = _ASSET_SOURCE_OUTPUT_DIRS.get(source_type)
             if not source_base_dir:
                 return error_response('无效的源类型')
 
@@ -661,7 +574,7 @@ def save_to_asset_library():
             ext = filename.rsplit('.', 1)[-1] if '.' in filename else ('mp4' if file_type == 'video' else 'png')
             new_filename = f"{timestamp}_{unique_id}.{ext}"
             target_path = os.path.join(target_dir, new_filename)
-            shutil.copy2(source_path, target_path)
+            shutil.copyfile(source_path, target_path)
 
         # 保存元数据
         meta_filename = new_filename + '.meta.json'
@@ -675,15 +588,15 @@ def save_to_asset_library():
             'source_type': source_type,
             'is_remote': is_remote_url
         }
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump(meta_data, f, ensure_ascii=False, indent=2)
+        with open(meta_path, 'wb') as f:
+            f.write(_json_dumps(meta_data))
 
         # 如果是视频，生成封面图
         if file_type == 'video':
             poster_dir = os.path.join(target_dir, 'posters')
             poster_filename = new_filename.rsplit('.', 1)[0] + '.jpg'
             poster_path = os.path.join(poster_dir, poster_filename)
-            generate_asset_video_poster(target_path, poster_path)
+            MediaHandler.generate_video_poster(target_path, poster_path)
 
         return jsonify({
             'success': True,
@@ -712,54 +625,9 @@ def batch_update_tags():
         if not assets:
             return error_response('请选择要更新的资产')
         
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
-        updated_count = 0
-        for asset in assets:
-            category = asset.get('category')
-            filename = asset.get('filename')
-            
-            if not category or not filename:
-                continue
-            
-            base_dir = category_dirs.get(category)
-            if not base_dir:
-                continue
-            
-            user_dir = os.path.join(base_dir, api_key_hash)
-            meta_path = os.path.join(user_dir, filename + '.meta.json')
-            
-            # 读取现有元数据
-            meta_data = {}
-            if os.path.exists(meta_path):
-                with open(meta_path, 'r', encoding='utf-8') as f:
-                    meta_data = json.load(f)
-            
-            # 更新标签
-            meta_data['project'] = project
-            meta_data['episode'] = episode
-            meta_data['filename'] = filename
-            meta_data['category'] = category
-            
-            # 保存元数据
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, ensure_ascii=False, indent=2)
-            
-            updated_count += 1
-        
-        # 如果项目/分集不存在，自动添加到项目列表
-        if project:
-            project_service = ProjectService(api_key_hash)
-            project_service.ensure_project_and_episode(project, episode)
-        
-        return jsonify({
-            'success': True,
-            'message': f'成功更新 {updated_count} 个资产的标签'
-        })
+        # 经由 ProjectService 写入，保证资产索引同步失效
+        _, message = ProjectService(api_key_hash).batch_update_tags(assets, project, episode)
+        return jsonify({'success': True, 'message': message})
     
     except Exception as e:
         print(f"[ERROR] 批量更新标签失败: {e}")
@@ -289,71 +289,8 @@ def get_i2i_thumbnails():
         # 获取任务列表（已经按批次分组）
         tasks, total_batches, has_more = cache_service.get_i2i_tasks_paginated(page, limit)
         
-        # 按批次分组，每个批次只取一个代表性缩略图
-        batch_thumbnails = {}  # batch_id -> thumbnail_info
-        standalone_thumbnails = []  # 独立任务的缩略图
-        
-        for task in tasks:
-            if task.get('task_status') != 'SUCCEEDED':
-                continue
-                
-            # 获取缩略图URL
-            poster_url = ''
-            if task.get('local_image_urls') and len(task['local_image_urls']) > 0:
-                poster_url = task['local_image_urls'][0]
-            elif task.get('image_urls') and len(task['image_urls']) > 0:
-                poster_url = task['image_urls'][0]
-            
-            if not poster_url:
-                continue
-            
-            batch_id = task.get('batch_id')
-            batch_index = task.get('batch_index', 1)
-            batch_total = task.get('batch_total', 1)
-            
-            if batch_id:
-                # 批次任务：只保留第一个完成的任务作为代表
-                if batch_id not in batch_thumbnails:
-                    batch_thumbnails[batch_id] = {
-                        'task_id': task['task_id'],
-                        'batch_id': batch_id,
-                        'batch_total': batch_total,
-                        'batch_completed': 1,
-                        'poster_url': poster_url,
-                        'type': 'image'
-                    }
-                else:
-                    # 增加已完成计数
-                    batch_thumbnails[batch_id]['batch_completed'] += 1
-            else:
-                # 独立任务
-                standalone_thumbnails.append({
-                    'task_id': task['task_id'],
-                    'batch_id': None,
-                    'batch_total': 1,
-                    'batch_completed': 1,
-                    'poster_url': poster_url,
-                    'type': 'image'
-                })
-        
-        # 合并缩略图列表，保持原有顺序
-        thumbnails = []
-        seen_batch_ids = set()
-        
-        for task in tasks:
-            batch_id = task.get('batch_id')
-            task_id = task.get('task_id')
-            
-            if batch_id:
-                if batch_id not in seen_batch_ids and batch_id in batch_thumbnails:
-                    thumbnails.append(batch_thumbnails[batch_id])
-                    seen_batch_ids.add(batch_id)
-            else:
-                # 查找对应的独立任务缩略图
-                for st in standalone_thumbnails:
-                    if st['task_id'] == task_id:
-                        thumbnails.append(st)
-                        break
+        # 按批次分组，每个批次只取一个代表性缩略图（使用第一张图，无图片的任务跳过）
+        thumbnails = TaskHandler.group_batch_thumbnails(tasks, TaskHandler.image_thumbnail_fields)
         
         return jsonify({
             'success': True,
@@ -10,6 +10,7 @@ import uuid
 from config import Config
 from services.video_service import VideoService
 from services.cache_service import CacheService
+from core.handlers.task_handler import TaskHandler
 from core.utils.session_helper import get_api_key, get_api_key_hash, require_auth
 from core.utils.response_helper import success_response, error_response
 from core.utils.validators import validate_batch_count
@@ -240,61 +241,11 @@ def get_kf2v_thumbnails():
         tasks, total_batches, has_more = cache_service.get_kf2v_tasks_paginated(page, limit)
         
         # 按批次分组，每个批次只取一个代表性缩略图
-        batch_thumbnails = {}  # batch_id -> thumbnail_info
-        standalone_thumbnails = []  # 独立任务的缩略图
-        
-        for task in tasks:
-            if task.get('task_status') != 'SUCCEEDED':
-                continue
-            
-            batch_id = task.get('batch_id')
-            batch_total = task.get('batch_total', 1)
-            
-            if batch_id:
-                # 批次任务：只保留第一个完成的任务作为代表
-                if batch_id not in batch_thumbnails:
-                    batch_thumbnails[batch_id] = {
-                        'task_id': task['task_id'],
-                        'batch_id': batch_id,
-                        'batch_total': batch_total,
-                        'batch_completed': 1,
-                        'poster_url': f"/api/video-poster/{api_key_hash}/{task['task_id']}",
-                        'video_path': f"/api/video/kf2v/{api_key_hash}/{task['task_id']}.mp4",
-                        'type': 'video'
-                    }
-                else:
-                    # 增加已完成计数
-                    batch_thumbnails[batch_id]['batch_completed'] += 1
-            else:
-                # 独立任务
-                standalone_thumbnails.append({
-                    'task_id': task['task_id'],
-                    'batch_id': None,
-                    'batch_total': 1,
-                    'batch_completed': 1,
-                    'poster_url': f"/api/video-poster/{api_key_hash}/{task['task_id']}",
-                    'video_path': f"/api/video/kf2v/{api_key_hash}/{task['task_id']}.mp4",
-                    'type': 'video'
-                })
-        
-        # 合并缩略图列表，保持原有顺序
-        thumbnails = []
-        seen_batch_ids = set()
-        
-        for task in tasks:
-            batch_id = task.get('batch_id')
-            task_id = task.get('task_id')
-            
-            if batch_id:
-                if batch_id not in seen_batch_ids and batch_id in batch_thumbnails:
-                    thumbnails.append(batch_thumbnails[batch_id])
-                    seen_batch_ids.add(batch_id)
-            else:
-                # 查找对应的独立任务缩略图
-                for st in standalone_thumbnails:
-                    if st['task_id'] == task_id:
-                        thumbnails.append(st)
-                        break
+        thumbnails = TaskHandler.group_batch_thumbnails(tasks, lambda task: {
+            'poster_url': f"/api/video-poster/{api_key_hash}/{task['task_id']}",
+            'video_path': f"/api/video/kf2v/{api_key_hash}/{task['task_id']}.mp4",
+            'type': 'video'
+        })
         
         return jsonify({
             'success': True,
@@ -112,15 +112,20 @@ def get_video_poster(api_key_hash, task_id):
         # 尝试获取或生成封面图
         poster_path = cache_service.get_or_generate_poster(task_id)
         
-        if poster_path and os.path.exists(poster_path):
-            # 返回封面图，带缓存头
-            response = make_response(send_file(poster_path, mimetype='image/jpeg'))
-            response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
-            response.headers['ETag'] = f'"{os.path.getmtime(poster_path)}"'
-            return response
-        else:
+        try:
+            poster_mtime = os.stat(poster_path).st_mtime if poster_path else None
+        except FileNotFoundError:
+            poster_mtime = None
+        
+        if poster_mtime is None:
             # 封面图生成失败，返回空响应
             return '', 204
+        
+        # 返回封面图，带缓存头
+        response = make_response(send_file(poster_path, mimetype='image/jpeg'))
+        response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
+        response.headers['ETag'] = f'"{poster_mtime}"'
+        return response
             
     except Exception as e:
         print(f"[ERROR] 获取视频封面失败: {e}")
@@ -148,15 +153,18 @@ def get_r2v_ref_video_poster(api_key_hash, filename):
         poster_path = os.path.join(poster_dir, f'{video_name}.jpg')
         
         # 如果封面图不存在，生成它
-        if not os.path.exists(poster_path):
+        try:
+            poster_mtime = os.stat(poster_path).st_mtime
+        except FileNotFoundError:
             success = MediaHandler.generate_video_poster(video_path, poster_path)
             if not success:
                 return '', 204
+            poster_mtime = os.stat(poster_path).st_mtime
         
         # 返回封面图，带缓存头
         response = make_response(send_file(poster_path, mimetype='image/jpeg'))
         response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
-        response.headers['ETag'] = f'"{os.path.getmtime(poster_path)}"'
+        response.headers['ETag'] = f'"{poster_mtime}"'
         return response
         
     except Exception as e:
@@ -191,10 +199,10 @@ def upload_audio():
             return jsonify({'success': False, 'message': '不支持的音频格式，仅支持 WAV 和 MP3'})
 
         # 生成新文件名
-        import uuid
+        import secrets
         import time
         timestamp = int(time.time())
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = secrets.token_hex(4)
         new_filename = f"{timestamp}_{unique_id}.{ext}"
 
         # 音频上传目录
@@ -240,11 +248,7 @@ def get_audio(api_key_hash, filename):
         if os.path.exists(filepath):
             # 根据扩展名返回正确的MIME类型
             ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'mp3'
-            mime_types = {
-                'mp3': 'audio/mpeg',
-                'wav': 'audio/wav'
-            }
-            mime_type = mime_types.get(ext, 'audio/mpeg')
+            mime_type = MediaHandler.AUDIO_MIME_TYPES.get(ext, 'audio/mpeg')
             return send_file(filepath, mimetype=mime_type)
         return jsonify({'error': '文件不存在'}), 404
     except Exception as e:
@@ -306,14 +310,16 @@ def get_asset_video_poster(api_key_hash, poster_filename):
             if video_path:
                 MediaHandler.generate_video_poster(video_path, poster_path)
         
-        if os.path.exists(poster_path):
-            response = make_response(send_file(poster_path, mimetype='image/jpeg'))
-            response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
-            response.headers['ETag'] = f'"{os.path.getmtime(poster_path)}"'
-            return response
-        else:
+        try:
+            poster_mtime = os.stat(poster_path).st_mtime
+        except FileNotFoundError:
             # 封面图生成失败，返回404
             return jsonify({'error': '封面图不存在'}), 404
+        
+        response = make_response(send_file(poster_path, mimetype='image/jpeg'))
+        response.headers['Cache-Control'] = 'public, max-age=2592000'  # 缓存30天
+        response.headers['ETag'] = f'"{poster_mtime}"'
+        return response
             
     except Exception as e:
         print(f"[ERROR] 获取资产视频封面失败: {e}")
@@ -405,7 +411,7 @@ def regenerate_task():
                     # wan2.6-t2i是同步接口，直接返回图片，需要下载到本地
                     if task_info.get('model') == 'wan2.6-t2i' and task_info.get('task_status') == 'SUCCEEDED':
                         if task_info.get('image_urls'):
-                            local_filenames = cache_service.download_t2i_images(task_info['task_id'], task_info['image_urls'])
+                            local_filenames = cache_service.download_t2i_images_parallel(task_info['task_id'], task_info['image_urls'])
                             if local_filenames:
                                 local_image_urls = [f'/api/t2i-image/{api_key_hash}/{fn}' for fn in local_filenames]
                                 task_info['local_image_urls'] = local_image_urls
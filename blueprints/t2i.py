@@ -1,11 +1,15 @@
 """文生图模块蓝图"""
-import uuid
+from secrets import token_hex
 from flask import Blueprint, render_template, request, jsonify, session
-from services.video_service import VideoService
+from services.video_service import get_video_service
 from services.cache_service import CacheService
 from core.handlers.task_handler import TaskHandler
 from core.utils.session_helper import get_api_key, get_api_key_hash, require_auth
 from core.utils.validators import validate_pagination
+from core.utils.response_helper import conditional_json
+from core.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 t2i_bp = Blueprint('t2i', __name__)
 
@@ -32,7 +36,7 @@ def create_t2i_task():
         if not prompt:
             return jsonify({'success': False, 'message': '请输入提示词'})
         
-        video_service = VideoService(api_key)
+        video_service = get_video_service(api_key)
         cache_service = CacheService(api_key_hash)
         
         # 提取参数
@@ -46,35 +50,34 @@ def create_t2i_task():
         batch_count = n if is_z_image else 1  # z-image-turbo 需要循环生成
         
         # 生成唯一的 batch_id
-        batch_id = uuid.uuid4().hex[:16]
+        batch_id = token_hex(8)
         
         # 创建回调函数用于更新wan2.6-t2i任务的缓存
         # 使用默认参数捕获当前值，避免闭包问题
         def update_t2i_cache(task_id: str, update_data: dict, _cache_service=cache_service, _api_key_hash=api_key_hash):
             """更新文生图任务缓存"""
             try:
-                print(f"[DEBUG] 开始更新缓存: {task_id}, status={update_data.get('task_status')}")
+                logger.debug("开始更新缓存: %s, status=%s", task_id, update_data.get('task_status'))
                 
                 # 如果成功，下载图片到本地
                 if update_data.get('task_status') == 'SUCCEEDED' and update_data.get('image_urls'):
-                    print(f"[DEBUG] 下载图片: {len(update_data['image_urls'])} 张")
-                    local_filenames = _cache_service.download_t2i_images(task_id, update_data['image_urls'])
+                    logger.debug("下载图片: %d 张", len(update_data['image_urls']))
+                    local_filenames = _cache_service.download_t2i_images_parallel(task_id, update_data['image_urls'])
                     if local_filenames:
                         local_image_urls = [f'/api/t2i-image/{_api_key_hash}/{fn}' for fn in local_filenames]
                         update_data['local_image_urls'] = local_image_urls
                         update_data['local_filenames'] = local_filenames
-                        print(f"[DEBUG] 图片下载完成: {len(local_filenames)} 个文件")
+                        logger.debug("图片下载完成: %d 个文件", len(local_filenames))
                 
                 _cache_service.update_t2i_task(task_id, update_data)
-                print(f"[INFO] 已更新wan2.6-t2i任务缓存: {task_id}")
-            except Exception as e:
-                print(f"[ERROR] 更新wan2.6-t2i任务缓存失败: {task_id}, {e}")
-                import traceback
-                traceback.print_exc()
+                logger.info("已更新wan2.6-t2i任务缓存: %s", task_id)
+            except Exception:
+                logger.exception("更新wan2.6-t2i任务缓存失败: %s", task_id)
         
         created_tasks = []
         
-        # z-image-turbo 需要串行生成多张，其他模型一次并行生成
+        # z-image-turbo 每次只生成1张，需创建多个任务（后台线程按间隔错峰调用API防止限流）
+        # 其他模型一次并行生成
         for i in range(batch_count):
             # 对于wan2.6-t2i和z-image-turbo传递回调函数
             callback = update_t2i_cache if params.get('model') in ['wan2.6-t2i', 'z-image-turbo'] else None
@@ -98,17 +101,12 @@ def create_t2i_task():
                 task_info['batch_index'] = i + 1
                 task_info['batch_total'] = batch_count
                 
-                cache_service.add_t2i_task(task_info)
                 created_tasks.append(task_info)
                 
-                print(f"[INFO] 创建文生图任务 {i + 1}/{batch_count}: {task_info['task_id']}, 每个任务生成: {images_per_task}张")
-                
-                # z-image-turbo 串行调用时，在两次调用之间增加延迟防止限流
-                if is_z_image and i < batch_count - 1:
-                    import time
-                    delay = 2  # 每次调用间隔2秒
-                    print(f"[INFO] z-image-turbo 串行生成，等待 {delay} 秒后创建下一个任务...")
-                    time.sleep(delay)
+                logger.info("创建文生图任务 %d/%d: %s, 每个任务生成: %d张", i + 1, batch_count, task_info['task_id'], images_per_task)
+        
+        # 同一批次的任务一次性写入缓存
+        cache_service.add_t2i_tasks_batch(created_tasks)
         
         if created_tasks:
             return jsonify(TaskHandler.build_task_response(created_tasks, batch_id))
@@ -116,7 +114,7 @@ def create_t2i_task():
             return jsonify({'success': False, 'message': '创建任务失败'})
     
     except Exception as e:
-        print(f"[ERROR] 创建文生图任务失败: {e}")
+        logger.exception("创建文生图任务失败")
         return jsonify({'success': False, 'message': f'创建任务失败: {str(e)}'})
 
 
@@ -144,7 +142,7 @@ def get_t2i_tasks():
         })
     
     except Exception as e:
-        print(f"[ERROR] 获取文生图任务列表失败: {e}")
+        logger.exception("获取文生图任务列表失败")
         return jsonify({'success': False, 'message': f'获取任务列表失败: {str(e)}'})
 
 
@@ -170,16 +168,16 @@ def get_t2i_task_status(task_id):
             return jsonify({'success': True, 'task': cached_task})
         
         # 查询任务状态
-        video_service = VideoService(api_key)
+        video_service = get_video_service(api_key)
         result = video_service.get_task_status(task_id)
         
         if result:
             if result.get('task_status') == 'SUCCEEDED' and result.get('results'):
-                image_urls = [img_result.get('url') for img_result in result['results'] if img_result.get('url')]
+                image_urls = [url for img_result in result['results'] if (url := img_result.get('url'))]
                 result['image_urls'] = image_urls
                 
                 # 下载图片到本地
-                local_filenames = cache_service.download_t2i_images(task_id, image_urls)
+                local_filenames = cache_service.download_t2i_images_parallel(task_id, image_urls)
                 if local_filenames:
                     local_image_urls = [f'/api/t2i-image/{api_key_hash}/{fn}' for fn in local_filenames]
                     result['local_image_urls'] = local_image_urls
@@ -191,7 +189,7 @@ def get_t2i_task_status(task_id):
             return jsonify({'success': False, 'message': '查询任务失败'})
     
     except Exception as e:
-        print(f"[ERROR] 查询文生图任务失败: {e}")
+        logger.exception("查询文生图任务失败")
         return jsonify({'success': False, 'message': f'查询任务失败: {str(e)}'})
 
 
@@ -211,83 +209,28 @@ def get_t2i_thumbnails():
         limit = request.args.get('limit', 50, type=int)
         limit = min(limit, 100)  # 最大100个
         
+        cached = cache_service.get_cached_thumbnails('t2i', page, limit)
+        if cached:
+            return conditional_json(cached)
+        
         # 获取任务列表
         tasks, total_batches, has_more = cache_service.get_t2i_tasks_paginated(page, limit)
         
-        # 按批次分组，每个批次只取一个代表性缩略图
-        batch_thumbnails = {}  # batch_id -> thumbnail_info
-        standalone_thumbnails = []  # 独立任务的缩略图
+        # 按批次分组，每个批次只取一个代表性缩略图（使用第一张图，无图片的任务跳过）
+        thumbnails = TaskHandler.group_batch_thumbnails(tasks, TaskHandler.image_thumbnail_fields)
         
-        for task in tasks:
-            if task.get('task_status') != 'SUCCEEDED':
-                continue
-            
-            # 使用第一张图作为缩略图
-            poster_url = ''
-            if task.get('local_image_urls') and len(task['local_image_urls']) > 0:
-                poster_url = task['local_image_urls'][0]
-            elif task.get('image_urls') and len(task['image_urls']) > 0:
-                poster_url = task['image_urls'][0]
-            
-            if not poster_url:
-                continue
-            
-            batch_id = task.get('batch_id')
-            batch_total = task.get('batch_total', 1)
-            
-            if batch_id:
-                # 批次任务：只保留第一个完成的任务作为代表
-                if batch_id not in batch_thumbnails:
-                    batch_thumbnails[batch_id] = {
-                        'task_id': task['task_id'],
-                        'batch_id': batch_id,
-                        'batch_total': batch_total,
-                        'batch_completed': 1,
-                        'poster_url': poster_url,
-                        'type': 'image'
-                    }
-                else:
-                    # 增加已完成计数
-                    batch_thumbnails[batch_id]['batch_completed'] += 1
-            else:
-                # 独立任务
-                standalone_thumbnails.append({
-                    'task_id': task['task_id'],
-                    'batch_id': None,
-                    'batch_total': 1,
-                    'batch_completed': 1,
-                    'poster_url': poster_url,
-                    'type': 'image'
-                })
-        
-        # 合并缩略图列表，保持原有顺序
-        thumbnails = []
-        seen_batch_ids = set()
-        
-        for task in tasks:
-            batch_id = task.get('batch_id')
-            task_id = task.get('task_id')
-            
-            if batch_id:
-                if batch_id not in seen_batch_ids and batch_id in batch_thumbnails:
-                    thumbnails.append(batch_thumbnails[batch_id])
-                    seen_batch_ids.add(batch_id)
-            else:
-                # 查找对应的独立任务缩略图
-                for st in standalone_thumbnails:
-                    if st['task_id'] == task_id:
-                        thumbnails.append(st)
-                        break
-        
-        return jsonify({
+        payload = {
             'success': True,
             'thumbnails': thumbnails,
             'page': page,
             'limit': limit,
             'total_tasks': len(thumbnails),  # 返回实际缩略图数量
             'has_more': has_more
-        })
+        }
+        cache_service.cache_thumbnails('t2i', page, limit, tasks, payload)
+        
+        return conditional_json(payload)
     
     except Exception as e:
-        print(f"[ERROR] 获取文生图缩略图列表失败: {e}")
+        logger.exception("获取文生图缩略图列表失败")
         return jsonify({'success': False, 'message': f'获取缩略图列表失败: {str(e)}'})
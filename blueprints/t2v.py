@@ -1,10 +1,14 @@
 """文生视频模块蓝图"""
 from flask import Blueprint, render_template, request, jsonify, session
-from services.video_service import VideoService
+from services.video_service import get_video_service
 from services.cache_service import CacheService
 from core.handlers.task_handler import TaskHandler
 from core.utils.session_helper import get_api_key, get_api_key_hash, require_auth
 from core.utils.validators import validate_pagination
+from core.utils.response_helper import conditional_json
+from core.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 t2v_bp = Blueprint('t2v', __name__)
 
@@ -33,7 +37,7 @@ def create_t2v_task():
             return jsonify({'success': False, 'message': '请输入提示词'})
         
         # 创建服务
-        video_service = VideoService(api_key)
+        video_service = get_video_service(api_key)
         cache_service = CacheService(api_key_hash)
         
         # 提取参数
@@ -42,19 +46,22 @@ def create_t2v_task():
         
         created_tasks = []
         
-        # 批量创建任务
-        for i in range(batch_count):
-            task_info = video_service.create_t2v_task(
-                prompt=prompt,
-                model=params.get('model', 'wan2.6-t2v'),
-                resolution=params['resolution'],
-                duration=params['duration'],
-                audio=params['audio'],
-                audio_url=params.get('audio_url', ''),
-                negative_prompt=params['negative_prompt'],
-                shot_type=params['shot_type']
-            )
-            
+        task_params = {
+            'task_type': 't2v',
+            'prompt': prompt,
+            'model': params.get('model', 'wan2.6-t2v'),
+            'resolution': params['resolution'],
+            'duration': params['duration'],
+            'audio': params['audio'],
+            'audio_url': params.get('audio_url', ''),
+            'negative_prompt': params['negative_prompt'],
+            'shot_type': params['shot_type']
+        }
+        
+        # 批量并发创建任务（gevent协程池），结果顺序与提交顺序一致
+        results = video_service.create_tasks_batch([task_params] * batch_count)
+        
+        for i, task_info in enumerate(results):
             if task_info:
                 # 添加批次信息
                 task_info['batch_id'] = batch_id
@@ -65,7 +72,7 @@ def create_t2v_task():
                 cache_service.add_t2v_task(task_info)
                 created_tasks.append(task_info)
                 
-                print(f"[INFO] 创建文生视频任务 {i + 1}/{batch_count}: {task_info['task_id']}")
+                logger.info("创建文生视频任务 %d/%d: %s", i + 1, batch_count, task_info['task_id'])
         
         if created_tasks:
             return jsonify(TaskHandler.build_task_response(created_tasks, batch_id))
@@ -73,7 +80,7 @@ def create_t2v_task():
             return jsonify({'success': False, 'message': '创建任务失败'})
     
     except Exception as e:
-        print(f"[ERROR] 创建文生视频任务失败: {e}")
+        logger.exception("创建文生视频任务失败")
         return jsonify({'success': False, 'message': f'创建任务失败: {str(e)}'})
 
 
@@ -109,7 +116,7 @@ def get_t2v_tasks():
         })
     
     except Exception as e:
-        print(f"[ERROR] 获取文生视频任务列表失败: {e}")
+        logger.exception("获取文生视频任务列表失败")
         return jsonify({'success': False, 'message': f'获取任务列表失败: {str(e)}'})
 
 
@@ -121,7 +128,7 @@ def get_t2v_task_status(task_id):
         api_key = get_api_key()
         api_key_hash = get_api_key_hash()
         
-        video_service = VideoService(api_key)
+        video_service = get_video_service(api_key)
         cache_service = CacheService(api_key_hash)
         
         # 查询任务状态
@@ -129,20 +136,26 @@ def get_t2v_task_status(task_id):
         
         if result:
             # 更新缓存
-            cache_service.update_t2v_task(task_id, result)
+            task_data = cache_service.update_t2v_task(task_id, result)
             
-            # 如果任务完成，下载视频
+            # 如果任务完成，后台下载视频；下载完成前前端继续轮询，下载失败后不再重试
             if result.get('task_status') == 'SUCCEEDED' and result.get('video_url'):
-                video_path = cache_service.download_t2v_video(task_id, result['video_url'])
+                if task_data and task_data.get('download_state') == 'failed':
+                    result['download_state'] = 'failed'
+                    return jsonify({'success': True, 'task': result})
+                
+                video_path = cache_service.download_t2v_video_background(task_id, result['video_url'])
                 if video_path:
                     result['local_video_path'] = f'/api/video/t2v/{api_key_hash}/{task_id}.mp4'
+                else:
+                    result['download_state'] = 'downloading'
             
             return jsonify({'success': True, 'task': result})
         else:
             return jsonify({'success': False, 'message': '查询任务失败'})
     
     except Exception as e:
-        print(f"[ERROR] 查询文生视频任务失败: {e}")
+        logger.exception("查询文生视频任务失败")
         return jsonify({'success': False, 'message': f'查询任务失败: {str(e)}'})
 
 
@@ -162,6 +175,10 @@ def get_t2v_thumbnails():
         limit = request.args.get('limit', 50, type=int)
         limit = min(limit, 100)  # 最大100个
         
+        cached = cache_service.get_cached_thumbnails('t2v', page, limit)
+        if cached:
+            return conditional_json(cached)
+        
         # 获取任务列表
         tasks, total_tasks, _ = cache_service.get_t2v_tasks_paginated(page, limit)
         
@@ -182,15 +199,18 @@ def get_t2v_thumbnails():
         # 计算是否还有更多
         has_more = (page * limit) < total_tasks
         
-        return jsonify({
+        payload = {
             'success': True,
             'thumbnails': thumbnails,
             'page': page,
             'limit': limit,
             'total_tasks': total_tasks,
             'has_more': has_more
-        })
+        }
+        cache_service.cache_thumbnails('t2v', page, limit, tasks, payload)
+        
+        return conditional_json(payload)
     
     except Exception as e:
-        print(f"[ERROR] 获取文生视频缩略图列表失败: {e}")
+        logger.exception("获取文生视频缩略图列表失败")
         return jsonify({'success': False, 'message': f'获取缩略图列表失败: {str(e)}'})
@@ -1,6 +1,7 @@
 """语音复刻模块蓝图"""
 import os
-import uuid
+import re
+from secrets import token_hex
 import time
 from flask import Blueprint, render_template, request, jsonify, session
 from config import Config
@@ -8,6 +9,7 @@ from services.voice_service import VoiceService
 from services.cache_service import CacheService
 from services.audio_service import AudioService
 from core.services.file_service import FileService
+from core.handlers.media_handler import MediaHandler
 from core.utils.session_helper import get_api_key, get_api_key_hash, require_auth
 from core.utils.logger import setup_logger
 
@@ -15,6 +17,9 @@ logger = setup_logger(__name__)
 
 voice_bp = Blueprint('voice', __name__)
 
+# 音色前缀：小写字母和数字，少于10个字符
+_VOICE_PREFIX_RE = re.compile(r'[a-z0-9]{1,9}')
+
 
 @voice_bp.route('/voice-clone')
 def voice_clone_page():
@@ -34,6 +39,10 @@ def upload_voice_audio():
     try:
         api_key_hash = get_api_key_hash()
         
+        # 读取请求体前按 Content-Length 拒绝超大上传（预留multipart表单开销）
+        if request.content_length and request.content_length > AudioService.MAX_AUDIO_SIZE + 64 * 1024:
+            return jsonify({'success': False, 'message': '文件大小超过限制(最大15MB)'})
+        
         if 'audio' not in request.files:
             return jsonify({'success': False, 'message': '没有上传文件'})
         
@@ -53,16 +62,15 @@ def upload_voice_audio():
         
         # 生成新文件名
         timestamp = int(time.time())
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = token_hex(4)
         new_filename = f"{timestamp}_{unique_id}.{ext}"
         
         # 语音样本上传目录
-        user_voice_dir = os.path.join(Config.UPLOAD_VOICE_DIR, api_key_hash)
-        os.makedirs(user_voice_dir, exist_ok=True)
+        user_voice_dir = CacheService(api_key_hash).get_upload_voice_dir()
         
         # 保存文件
         filepath = os.path.join(user_voice_dir, new_filename)
-        file.save(filepath)
+        FileService.save_stream(file, filepath)
         
         logger.info(f"语音样本已上传: {filepath}")
         
@@ -80,24 +88,14 @@ def upload_voice_audio():
 @voice_bp.route('/api/voice/audio/<api_key_hash>/<filename>')
 def get_voice_audio(api_key_hash, filename):
     """获取语音样本或合成音频文件"""
-    from flask import send_file
     try:
-        # 先尝试语音样本目录
-        filepath = os.path.join(Config.UPLOAD_VOICE_DIR, api_key_hash, filename)
-        
-        # 如果样本目录不存在，尝试输出目录
-        if not os.path.exists(filepath):
-            filepath = os.path.join(Config.OUTPUT_VOICE_DIR, api_key_hash, filename)
-        
-        if os.path.exists(filepath):
-            # 根据扩展名返回正确的MIME类型
-            ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'mp3'
-            mime_types = {
-                'mp3': 'audio/mpeg',
-                'wav': 'audio/wav'
-            }
-            mime_type = mime_types.get(ext, 'audio/mpeg')
-            return send_file(filepath, mimetype=mime_type)
+        # 先尝试语音样本目录，再尝试合成输出目录（每个候选路径只 stat 一次）
+        for base_dir in (Config.UPLOAD_VOICE_DIR, Config.OUTPUT_VOICE_DIR):
+            filepath = os.path.join(base_dir, api_key_hash, filename)
+            if os.path.isfile(filepath):
+                # 根据扩展名返回正确的MIME类型
+                ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'mp3'
+                return MediaHandler.serve_file(filepath, MediaHandler.AUDIO_MIME_TYPES.get(ext, 'audio/mpeg'))
         
         return jsonify({'error': '文件不存在'}), 404
     except Exception as e:
@@ -128,11 +126,8 @@ def create_voice():
         if not prefix:
             return jsonify({'success': False, 'message': '请输入音色前缀'})
         
-        if len(prefix) >= 10:
-            return jsonify({'success': False, 'message': '前缀必须小于10个字符'})
-        
-        if not prefix.isalnum():
-            return jsonify({'success': False, 'message': '前缀只能包含小写字母和数字'})
+        if not _VOICE_PREFIX_RE.fullmatch(prefix):
+            return jsonify({'success': False, 'message': '前缀只能包含小写字母和数字，且必须小于10个字符'})
         
         # 验证音频文件存在
         audio_path = os.path.join(Config.UPLOAD_VOICE_DIR, api_key_hash, audio_filename)
@@ -302,7 +297,7 @@ def synthesize_speech():
         cache_service = CacheService(api_key_hash)
         
         # 生成任务ID和输出路径
-        task_id = f"synth_{uuid.uuid4().hex[:16]}"
+        task_id = f"synth_{token_hex(8)}"
         output_dir = cache_service.get_output_voice_dir()
         output_path = os.path.join(output_dir, f"{task_id}.mp3")
         
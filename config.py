@@ -55,40 +55,38 @@ class Config:
     # 通义万相API配置
     DASHSCOPE_BASE_URL = 'https://dashscope.aliyuncs.com/api/v1'
     
+    # 反向代理文件下发 (Nginx X-Accel-Redirect)
+    # 设置后，音频等文件由Nginx直接发送，内部location需指向 CACHE_DIR，例如 /_protected/
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '')
+    
     # 上传配置
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'webp', 'mp4', 'mov', 'avi', 'webm'}
     
+    # 启动时需要创建的全部目录
+    _ALL_DIRS = (
+        # 上传目录
+        UPLOAD_I2V_DIR, UPLOAD_KF2V_DIR, UPLOAD_I2I_DIR, UPLOAD_R2V_DIR,
+        UPLOAD_AUDIO_DIR, UPLOAD_VOICE_DIR,
+        # 输出目录
+        OUTPUT_I2V_DIR, OUTPUT_KF2V_DIR, OUTPUT_T2I_DIR, OUTPUT_I2I_DIR,
+        OUTPUT_R2V_DIR, OUTPUT_T2V_DIR, OUTPUT_VOICE_DIR,
+        # 任务目录
+        TASK_I2V_DIR, TASK_KF2V_DIR, TASK_T2I_DIR, TASK_I2I_DIR,
+        TASK_R2V_DIR, TASK_T2V_DIR, TASK_VOICE_DIR,
+        # 资产库目录
+        ASSETS_STORYBOARD_DIR, ASSETS_ARTWORK_DIR, ASSETS_VIDEO_DIR,
+    )
+    _inited = False
+    
     @staticmethod
     def init_app(app):
-        """初始化应用，创建必要的目录结构"""
-        # 创建上传目录
-        os.makedirs(Config.UPLOAD_I2V_DIR, exist_ok=True)
-        os.makedirs(Config.UPLOAD_KF2V_DIR, exist_ok=True)
-        os.makedirs(Config.UPLOAD_I2I_DIR, exist_ok=True)
-        os.makedirs(Config.UPLOAD_R2V_DIR, exist_ok=True)
-        os.makedirs(Config.UPLOAD_AUDIO_DIR, exist_ok=True)
-        os.makedirs(Config.UPLOAD_VOICE_DIR, exist_ok=True)
-        
-        # 创建输出目录
-        os.makedirs(Config.OUTPUT_I2V_DIR, exist_ok=True)
-        os.makedirs(Config.OUTPUT_KF2V_DIR, exist_ok=True)
-        os.makedirs(Config.OUTPUT_T2I_DIR, exist_ok=True)
-        os.makedirs(Config.OUTPUT_I2I_DIR, exist_ok=True)
-        os.makedirs(Config.OUTPUT_R2V_DIR, exist_ok=True)
-        os.makedirs(Config.OUTPUT_T2V_DIR, exist_ok=True)
-        os.makedirs(Config.OUTPUT_VOICE_DIR, exist_ok=True)
-        
-        # 创建任务目录
-        os.makedirs(Config.TASK_I2V_DIR, exist_ok=True)
-        os.makedirs(Config.TASK_KF2V_DIR, exist_ok=True)
-        os.makedirs(Config.TASK_T2I_DIR, exist_ok=True)
-        os.makedirs(Config.TASK_I2I_DIR, exist_ok=True)
-        os.makedirs(Config.TASK_R2V_DIR, exist_ok=True)
-        os.makedirs(Config.TASK_T2V_DIR, exist_ok=True)
-        os.makedirs(Config.TASK_VOICE_DIR, exist_ok=True)
+        """初始化应用，创建必要的目录结构
         
-        # 创建资产库目录
-        os.makedirs(Config.ASSETS_STORYBOARD_DIR, exist_ok=True)
-        os.makedirs(Config.ASSETS_ARTWORK_DIR, exist_ok=True)
-        os.makedirs(Config.ASSETS_VIDEO_DIR, exist_ok=True)
+        同一进程内只执行一次 (app.py 与 create_app 均会调用)
+        """
+        if Config._inited:
+            return
+        for d in Config._ALL_DIRS:
+            os.makedirs(d, exist_ok=True)
+        Config._inited = True
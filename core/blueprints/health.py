@@ -9,18 +9,58 @@
 """
 
 from flask import Blueprint, jsonify, current_app
-from datetime import datetime
 import os
 import psutil
+import threading
 import time
 from typing import Dict, Any
 
+from config import Config
+
 health_bp = Blueprint('health', __name__)
 
 # 应用启动时间
 _start_time = time.time()
 
-# 简单的指标收集器
+# 当前进程句柄，避免每次请求重新创建
+# cpu_percent(interval=None) 返回距上次调用的占用率，导入时先调用一次作为基准
+_PROCESS = psutil.Process()
+_PROCESS.cpu_percent(interval=None)
+psutil.cpu_percent(interval=None)
+_process_lock = threading.Lock()
+
+
+def _get_process() -> psutil.Process:
+    """获取当前进程句柄
+    
+    gunicorn 预加载时本模块在主进程导入，fork 出的 worker 继承的是主进程的句柄，
+    pid 不一致时为当前 worker 重新创建
+    """
+    global _PROCESS
+    process = _PROCESS
+    if process.pid != os.getpid():
+        with _process_lock:
+            process = _PROCESS
+            if process.pid != os.getpid():
+                process = psutil.Process()
+                process.cpu_percent(interval=None)
+                _PROCESS = process
+    return process
+
+# 就绪探针写入测试的目录 (导入时确定，探针每几秒一次无需重复读取环境变量)
+_CACHE_DIR = Config.CACHE_DIR
+_CACHE_TEST_FILE = os.path.join(_CACHE_DIR, '.health_check')
+_LOG_DIR = 'logs'
+_LOG_TEST_FILE = os.path.join(_LOG_DIR, '.health_check')
+
+# 就绪检查结果缓存
+_READY_CACHE_TTL = 5  # 秒
+_ready_cache = {'ts': 0, 'result': None}
+_ready_cache_lock = threading.Lock()
+
+# 简单的指标收集器 (进程内计数，多个 worker 各自独立，/metrics 只返回处理该次采集的 worker 的计数)
+# 请求计数由本蓝图的 after_app_request 钩子记录，注册蓝图后对所有请求生效
+_metrics_lock = threading.Lock()
 _metrics = {
     'requests_total': 0,
     'requests_by_status': {},
@@ -30,14 +70,68 @@ _metrics = {
 }
 
 
+# /metrics 输出模板，每次采集只做一次格式化
+_METRICS_TEMPLATE = """\
+# HELP wanx_requests_total Total number of HTTP requests handled by this worker process
+# TYPE wanx_requests_total counter
+wanx_requests_total %(requests_total)d
+# HELP wanx_requests_by_status HTTP requests handled by this worker process, by status code
+# TYPE wanx_requests_by_status counter
+%(requests_by_status)s\
+# HELP wanx_task_created Total number of tasks created
+# TYPE wanx_task_created counter
+wanx_task_created %(task_created)d
+# HELP wanx_task_succeeded Total number of tasks succeeded
+# TYPE wanx_task_succeeded counter
+wanx_task_succeeded %(task_succeeded)d
+# HELP wanx_task_failed Total number of tasks failed
+# TYPE wanx_task_failed counter
+wanx_task_failed %(task_failed)d
+# HELP wanx_uptime_seconds Application uptime in seconds
+# TYPE wanx_uptime_seconds gauge
+wanx_uptime_seconds %(uptime)d
+# HELP wanx_process_cpu_percent Process CPU usage percentage
+# TYPE wanx_process_cpu_percent gauge
+wanx_process_cpu_percent %(cpu_percent)s
+# HELP wanx_process_memory_bytes Process memory usage in bytes
+# TYPE wanx_process_memory_bytes gauge
+wanx_process_memory_bytes %(memory_bytes)d
+"""
+
+
+def _utcnow_iso() -> str:
+    """当前UTC时间的ISO8601字符串(精确到秒)"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
 def increment_metric(metric_name: str, value: int = 1, labels: Dict[str, str] = None):
-    """递增指标计数"""
-    if metric_name in _metrics:
-        if isinstance(_metrics[metric_name], dict) and labels:
-            key = '_'.join(f"{k}:{v}" for k, v in labels.items())
-            _metrics[metric_name][key] = _metrics[metric_name].get(key, 0) + value
+    """递增指标计数
+    
+    带标签的指标以 ((标签名, 标签值), ...) 元组为键计数
+    """
+    with _metrics_lock:
+        metric = _metrics.get(metric_name)
+        if metric is None:
+            return
+        if isinstance(metric, dict):
+            if labels:
+                key = tuple(labels.items())
+                metric[key] = metric.get(key, 0) + value
         else:
-            _metrics[metric_name] += value
+            _metrics[metric_name] = metric + value
+
+
+@health_bp.after_app_request
+def _count_request(response):
+    """统计当前 worker 处理的请求数及各状态码的请求数"""
+    increment_metric('requests_total')
+    increment_metric('requests_by_status', labels={'status': str(response.status_code)})
+    return response
+
+
+def _format_labels(key) -> str:
+    """将标签键元组格式化为 Prometheus 标签字符串"""
+    return ','.join('%s="%s"' % item for item in key)
 
 
 @health_bp.route('/health', methods=['GET'])
@@ -48,26 +142,24 @@ def health_check():
     """
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
+        'timestamp': _utcnow_iso()
     })
 
 
-@health_bp.route('/ready', methods=['GET'])
-def readiness_check():
-    """就绪检查(就绪探针)
-    
-    检查应用是否准备好接收流量
+def _run_readiness_checks():
+    """执行目录可写性检查
+
+    Returns:
+        (checks, all_ready)
     """
     checks = {}
     all_ready = True
     
     # 检查缓存目录是否可写
     try:
-        cache_dir = os.getenv('CACHE_DIR', './cache')
-        test_file = os.path.join(cache_dir, '.health_check')
-        with open(test_file, 'w') as f:
+        with open(_CACHE_TEST_FILE, 'w') as f:
             f.write('test')
-        os.remove(test_file)
+        os.remove(_CACHE_TEST_FILE)
         checks['cache_dir'] = 'ok'
     except Exception as e:
         checks['cache_dir'] = f'error: {str(e)}'
@@ -75,23 +167,38 @@ def readiness_check():
     
     # 检查日志目录是否可写
     try:
-        log_dir = 'logs'
-        os.makedirs(log_dir, exist_ok=True)
-        test_file = os.path.join(log_dir, '.health_check')
-        with open(test_file, 'w') as f:
+        os.makedirs(_LOG_DIR, exist_ok=True)
+        with open(_LOG_TEST_FILE, 'w') as f:
             f.write('test')
-        os.remove(test_file)
+        os.remove(_LOG_TEST_FILE)
         checks['log_dir'] = 'ok'
     except Exception as e:
         checks['log_dir'] = f'error: {str(e)}'
         all_ready = False
     
+    return checks, all_ready
+
+
+@health_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """就绪检查(就绪探针)
+    
+    检查应用是否准备好接收流量。
+    检查结果缓存 _READY_CACHE_TTL 秒，避免每次探针都在缓存目录(可能是NAS)上写文件
+    """
+    with _ready_cache_lock:
+        now = time.time()
+        if _ready_cache['result'] is None or now - _ready_cache['ts'] >= _READY_CACHE_TTL:
+            _ready_cache['result'] = _run_readiness_checks()
+            _ready_cache['ts'] = now
+        checks, all_ready = _ready_cache['result']
+    
     status_code = 200 if all_ready else 503
     
     return jsonify({
         'status': 'ready' if all_ready else 'not_ready',
         'checks': checks,
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
+        'timestamp': _utcnow_iso()
     }), status_code
 
 
@@ -106,16 +213,16 @@ def status_check():
     uptime_str = f"{int(uptime_seconds // 3600)}h {int((uptime_seconds % 3600) // 60)}m {int(uptime_seconds % 60)}s"
     
     # 获取进程资源使用情况
-    process = psutil.Process()
+    process = _get_process()
     
     # 获取系统资源使用情况
-    cpu_percent = psutil.cpu_percent(interval=0.1)
+    cpu_percent = psutil.cpu_percent(interval=None)
     memory = psutil.virtual_memory()
     disk = psutil.disk_usage('.')
     
     return jsonify({
         'status': 'running',
-        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'timestamp': _utcnow_iso(),
         'uptime': uptime_str,
         'uptime_seconds': int(uptime_seconds),
         'process': {
@@ -146,47 +253,23 @@ def metrics():
     
     暴露应用指标供Prometheus采集
     """
-    lines = []
-    
-    # 请求总数
-    lines.append('# HELP wanx_requests_total Total number of HTTP requests')
-    lines.append('# TYPE wanx_requests_total counter')
-    lines.append(f'wanx_requests_total {_metrics.get("requests_total", 0)}')
-    
-    # 按状态码分组的请求数
-    lines.append('# HELP wanx_requests_by_status HTTP requests by status code')
-    lines.append('# TYPE wanx_requests_by_status counter')
-    for label, count in _metrics.get('requests_by_status', {}).items():
-        status_code = label.split(':')[1]
-        lines.append(f'wanx_requests_by_status{{status="{status_code}"}} {count}')
-    
-    # 任务指标
-    lines.append('# HELP wanx_task_created Total number of tasks created')
-    lines.append('# TYPE wanx_task_created counter')
-    lines.append(f'wanx_task_created {_metrics.get("task_created", 0)}')
-    
-    lines.append('# HELP wanx_task_succeeded Total number of tasks succeeded')
-    lines.append('# TYPE wanx_task_succeeded counter')
-    lines.append(f'wanx_task_succeeded {_metrics.get("task_succeeded", 0)}')
-    
-    lines.append('# HELP wanx_task_failed Total number of tasks failed')
-    lines.append('# TYPE wanx_task_failed counter')
-    lines.append(f'wanx_task_failed {_metrics.get("task_failed", 0)}')
-    
-    # 运行时长
-    uptime = time.time() - _start_time
-    lines.append('# HELP wanx_uptime_seconds Application uptime in seconds')
-    lines.append('# TYPE wanx_uptime_seconds gauge')
-    lines.append(f'wanx_uptime_seconds {int(uptime)}')
-    
-    # 系统资源
-    process = psutil.Process()
-    lines.append('# HELP wanx_process_cpu_percent Process CPU usage percentage')
-    lines.append('# TYPE wanx_process_cpu_percent gauge')
-    lines.append(f'wanx_process_cpu_percent {process.cpu_percent()}')
-    
-    lines.append('# HELP wanx_process_memory_bytes Process memory usage in bytes')
-    lines.append('# TYPE wanx_process_memory_bytes gauge')
-    lines.append(f'wanx_process_memory_bytes {process.memory_info().rss}')
-    
-    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    with _metrics_lock:
+        by_status = list(_metrics['requests_by_status'].items())
+    status_lines = ''.join(
+        'wanx_requests_by_status{%s} %d\n' % (_format_labels(key), count)
+        for key, count in by_status
+    )
+    
+    process = _get_process()
+    body = _METRICS_TEMPLATE % {
+        'requests_total': _metrics.get('requests_total', 0),
+        'requests_by_status': status_lines,
+        'task_created': _metrics.get('task_created', 0),
+        'task_succeeded': _metrics.get('task_succeeded', 0),
+        'task_failed': _metrics.get('task_failed', 0),
+        'uptime': int(time.time() - _start_time),
+        'cpu_percent': process.cpu_percent(),
+        'memory_bytes': process.memory_info().rss,
+    }
+    
+    return body, 200, {'Content-Type': 'text/plain; charset=utf-8'}
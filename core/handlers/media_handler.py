@@ -1,7 +1,47 @@
 """媒体文件处理器"""
 import os
 import subprocess
+import threading
 from flask import request, Response, jsonify, send_file, make_response
+from werkzeug.wsgi import wrap_file
+from config import Config
+from core.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 视频流传输块大小 (服务器不支持 sendfile 时逐块读取)
+VIDEO_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+
+
+class _BoundedFile:
+    """只允许读取指定字节数的文件包装
+    
+    用于Range响应：通过 wsgi.file_wrapper 交给服务器传输时，
+    服务器按当前偏移和 Content-Length 走 sendfile；
+    回退到逐块读取时，read() 保证不会超出请求的范围。
+    """
+    
+    def __init__(self, f, length):
+        self._f = f
+        self._remaining = length
+    
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+    
+    def fileno(self):
+        return self._f.fileno()
+    
+    def tell(self):
+        return self._f.tell()
+    
+    def close(self):
+        self._f.close()
 
 
 class MediaHandler:
@@ -10,12 +50,53 @@ class MediaHandler:
     提取媒体文件服务的通用逻辑
     """
     
+    # 扩展名 -> MIME类型
+    IMAGE_MIME_TYPES = {
+        'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
+        'png': 'image/png', 'webp': 'image/webp',
+        'bmp': 'image/bmp', 'gif': 'image/gif'
+    }
+    AUDIO_MIME_TYPES = {
+        'mp3': 'audio/mpeg',
+        'wav': 'audio/wav'
+    }
+    
+    @staticmethod
+    def _not_modified(etag, mtime, cache_control):
+        """检查条件请求头，客户端缓存仍有效时返回304响应
+        
+        优先比较 If-None-Match，未携带时再比较 If-Modified-Since
+        
+        Args:
+            etag: 当前文件的ETag (带引号)
+            mtime: 文件修改时间戳
+            cache_control: 304响应携带的Cache-Control
+            
+        Returns:
+            304 Response 或 None
+        """
+        if request.if_none_match:
+            matched = request.if_none_match.contains(etag.strip('"'))
+        elif request.if_modified_since is not None:
+            matched = int(mtime) <= request.if_modified_since.timestamp()
+        else:
+            return None
+        
+        if not matched:
+            return None
+        
+        response = Response(status=304)
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+        return response
+    
     @staticmethod
     def serve_video_with_range(filepath, mimetype='video/mp4'):
         """支持Range请求的视频服务
         
         解决NAS挂载目录读取慢的问题，实现：
-        1. 分段传输 - 不用一次读取整个文件
+        1. 分段传输 - 不用一次读取整个文件；文件对象经 wsgi.file_wrapper
+           交给服务器，gunicorn 等会直接用 sendfile 发送
         2. 进度条拖动 - 支持seek操作
         3. 浏览器缓存 - 减少重复请求
         4. 完整播放 - 支持完整视频流式加载
@@ -27,13 +108,21 @@ class MediaHandler:
         Returns:
             Flask Response对象
         """
-        if not os.path.exists(filepath):
+        # 一次 stat 同时获取大小和修改时间 (NAS 上每次 stat 都有明显延迟)
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
             return jsonify({'error': '文件不存在'}), 404
 
-        file_size = os.path.getsize(filepath)
-        range_header = request.headers.get('Range', None)
+        file_size = st.st_size
+        etag = f'"{st.st_mtime}-{file_size}"'
         
-        # print(f"[VIDEO DEBUG] 请求文件: {filepath}, 大小: {file_size}, Range: {range_header}")
+        # 浏览器缓存仍有效时直接304，不打开文件
+        not_modified = MediaHandler._not_modified(etag, st.st_mtime, 'no-cache')
+        if not_modified is not None:
+            return not_modified
+        
+        range_header = request.headers.get('Range', None)
 
         if range_header:
             # 处理Range请求
@@ -52,27 +141,13 @@ class MediaHandler:
                 byte_end = min(byte_end, file_size - 1)
 
             content_length = byte_end - byte_start + 1
-            
-            # print(f"[VIDEO DEBUG] Range解析: start={byte_start}, end={byte_end}, content_length={content_length}")
 
-            def generate():
-                bytes_sent = 0
-                with open(filepath, 'rb') as f:
-                    f.seek(byte_start)
-                    remaining = content_length
-                    chunk_size = 1024 * 1024  # 1MB
-                    while remaining > 0:
-                        read_size = min(chunk_size, remaining)
-                        data = f.read(read_size)
-                        if not data:
-                            break
-                        remaining -= len(data)
-                        bytes_sent += len(data)
-                        yield data
-                # print(f"[VIDEO DEBUG] 流式传输完成: 已发送 {bytes_sent} 字节")
+            # 无缓冲打开：每次 read 直接对应一次 os.read，省去 BufferedReader 的额外拷贝
+            f = open(filepath, 'rb', buffering=0)
+            f.seek(byte_start)
 
             response = Response(
-                generate(),
+                wrap_file(request.environ, _BoundedFile(f, content_length), VIDEO_CHUNK_SIZE),
                 status=206,  # Partial Content
                 mimetype=mimetype,
                 direct_passthrough=True
@@ -81,27 +156,14 @@ class MediaHandler:
             response.headers['Content-Length'] = content_length
             response.headers['Accept-Ranges'] = 'bytes'
             response.headers['Cache-Control'] = 'no-cache'
-            response.headers['ETag'] = f'"{os.path.getmtime(filepath)}-{file_size}"'
+            response.headers['ETag'] = etag
+            response.last_modified = st.st_mtime
             
             return response
         else:
             # 非Range请求，返回完整文件
-            # print(f"[VIDEO DEBUG] 非Range请求，返回完整文件: {file_size} 字节")
-            
-            def generate_full():
-                bytes_sent = 0
-                with open(filepath, 'rb') as f:
-                    chunk_size = 1024 * 1024  # 1MB块
-                    while True:
-                        data = f.read(chunk_size)
-                        if not data:
-                            break
-                        bytes_sent += len(data)
-                        yield data
-                # print(f"[VIDEO DEBUG] 完整传输完成: 已发送 {bytes_sent} 字节")
-
             response = Response(
-                generate_full(),
+                wrap_file(request.environ, open(filepath, 'rb', buffering=0), VIDEO_CHUNK_SIZE),
                 status=200,
                 mimetype=mimetype,
                 direct_passthrough=True
@@ -109,7 +171,8 @@ class MediaHandler:
             response.headers['Content-Length'] = file_size
             response.headers['Accept-Ranges'] = 'bytes'
             response.headers['Cache-Control'] = 'no-cache'
-            response.headers['ETag'] = f'"{os.path.getmtime(filepath)}-{file_size}"'
+            response.headers['ETag'] = etag
+            response.last_modified = st.st_mtime
             return response
     
     @staticmethod
@@ -123,29 +186,63 @@ class MediaHandler:
         Returns:
             Flask Response对象
         """
-        if not os.path.exists(filepath):
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
             return jsonify({'error': '文件不存在'}), 404
         
+        etag = f'"{st.st_mtime}-{st.st_size}"'
+        cache_control = f'public, max-age={cache_days * 86400}'
+        not_modified = MediaHandler._not_modified(etag, st.st_mtime, cache_control)
+        if not_modified is not None:
+            return not_modified
+        
         # 检测MIME类型
         filename = os.path.basename(filepath)
         ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'png'
-        mime_types = {
-            'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
-            'png': 'image/png', 'webp': 'image/webp',
-            'bmp': 'image/bmp', 'gif': 'image/gif'
-        }
-        mimetype = mime_types.get(ext, 'image/png')
+        mimetype = MediaHandler.IMAGE_MIME_TYPES.get(ext, 'image/png')
 
         response = make_response(send_file(filepath, mimetype=mimetype))
-        response.headers['Cache-Control'] = f'public, max-age={cache_days * 86400}'
-        response.headers['ETag'] = f'"{os.path.getmtime(filepath)}-{os.path.getsize(filepath)}"'
+        response.headers['Cache-Control'] = cache_control
+        response.headers['ETag'] = etag
         return response
     
+    @staticmethod
+    def serve_file(filepath, mimetype):
+        """文件下发，配置了 X_ACCEL_REDIRECT_PREFIX 时交给Nginx直接发送
+        
+        Nginx 通过 sendfile 在内核中传输文件，Python worker 无需等待客户端下载完成
+        
+        Args:
+            filepath: 文件路径（需位于 CACHE_DIR 下才会交给Nginx）
+            mimetype: MIME类型
+            
+        Returns:
+            Flask Response对象
+        """
+        prefix = Config.X_ACCEL_REDIRECT_PREFIX
+        if prefix:
+            cache_dir = os.path.abspath(Config.CACHE_DIR)
+            abs_path = os.path.abspath(filepath)
+            if abs_path.startswith(cache_dir + os.sep):
+                rel_path = os.path.relpath(abs_path, cache_dir).replace(os.sep, '/')
+                response = make_response('')
+                response.headers['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{rel_path}"
+                response.headers['Content-Type'] = mimetype
+                return response
+        
+        return send_file(filepath, mimetype=mimetype)
+    
+    # 正在生成中的封面图: poster_path -> Lock，避免同一封面被并发请求重复调用ffmpeg
+    _poster_locks = {}
+    _poster_locks_lock = threading.Lock()
+    
     @staticmethod
     def generate_video_poster(video_path, poster_path):
         """生成视频封面图
         
-        使用ffmpeg提取视频帧作为封面
+        使用ffmpeg提取视频帧作为封面。同一封面的并发请求只会启动一个ffmpeg进程，
+        其余请求等待其完成后直接复用结果。
         
         Args:
             video_path: 视频文件路径
@@ -157,15 +254,40 @@ class MediaHandler:
         if os.path.exists(poster_path):
             return True  # 已存在
         
+        with MediaHandler._poster_locks_lock:
+            lock = MediaHandler._poster_locks.setdefault(poster_path, threading.Lock())
+        
+        try:
+            with lock:
+                if os.path.exists(poster_path):
+                    return True  # 其他请求已生成
+                return MediaHandler._run_ffmpeg_poster(video_path, poster_path)
+        finally:
+            with MediaHandler._poster_locks_lock:
+                if MediaHandler._poster_locks.get(poster_path) is lock:
+                    del MediaHandler._poster_locks[poster_path]
+    
+    @staticmethod
+    def _run_ffmpeg_poster(video_path, poster_path):
+        """调用ffmpeg截取第0.5秒的帧并保存为JPEG
+        
+        这里在请求处理中执行，不像 scripts/generate_posters.py 那样用 PyAV 在进程内解码：
+        gevent worker 下进程内解码是一段不让出的 C 调用，会卡住同一 worker 的所有协程；
+        而 gevent 补丁后的 subprocess 在等待 ffmpeg 期间会让出，其他请求照常处理
+        """
         try:
             # 确保目录存在
             os.makedirs(os.path.dirname(poster_path), exist_ok=True)
             
             # 使用ffmpeg提取第0.5秒的帧作为封面
+            # 只截一帧：跳过音频/字幕/数据流，单线程解码避免在多核机器上启动解码线程池
             cmd = [
                 'ffmpeg',
+                '-hide_banner', '-loglevel', 'error',
                 '-ss', '0.5',
+                '-threads', '1',
                 '-i', video_path,
+                '-an', '-sn', '-dn',
                 '-vframes', '1',
                 '-vf', 'scale=-1:360',  # 缩放高度为360px
                 '-q:v', '3',  # 高质量JPEG
@@ -180,16 +302,19 @@ class MediaHandler:
             )
             
             if result.returncode == 0 and os.path.exists(poster_path):
-                print(f"[INFO] 视频封面生成成功: {poster_path}")
+                logger.info("视频封面生成成功: %s", poster_path)
                 return True
             else:
                 error_msg = result.stderr.decode('utf-8', errors='ignore')
-                print(f"[ERROR] 视频封面生成失败: {error_msg[:200]}")
+                logger.error("视频封面生成失败: %s", error_msg[:200])
                 return False
                 
         except subprocess.TimeoutExpired:
-            print(f"[ERROR] ffmpeg超时: {video_path}")
+            logger.error("ffmpeg超时: %s", video_path)
+            return False
+        except FileNotFoundError:
+            logger.error("ffmpeg未安装，请先安装ffmpeg")
             return False
         except Exception as e:
-            print(f"[ERROR] 生成视频封面异常: {e}")
+            logger.error("生成视频封面异常: %s", e)
             return False
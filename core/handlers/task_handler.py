@@ -2,6 +2,32 @@
 import uuid
 from core.utils.validators import validate_batch_count
 
+# 各任务类型的特定参数: (参数名, 默认值, 类型转换)，导入时按任务类型展开一次
+_VIDEO_PARAMS = (
+    ('resolution', '720P', None),
+    ('duration', 5, int),
+    ('audio', False, None),
+    ('audio_url', '', None),
+    ('watermark', False, None),
+)
+_IMAGE_PARAMS = (
+    ('size', '1024*1024', None),
+    ('n', 1, None),
+    ('watermark', False, None),
+    ('prompt_extend', True, None),
+)
+_PROMPT_EXTEND_PARAMS = (('prompt_extend', True, None),)
+_SHOT_TYPE_PARAMS = (('shot_type', 'single', None),)
+
+_TASK_EXTRA_PARAMS = {
+    'i2v': _VIDEO_PARAMS + _PROMPT_EXTEND_PARAMS + _SHOT_TYPE_PARAMS,
+    't2v': _VIDEO_PARAMS + _SHOT_TYPE_PARAMS,
+    'kf2v': _VIDEO_PARAMS + _PROMPT_EXTEND_PARAMS,
+    't2i': _IMAGE_PARAMS,
+    'i2i': _IMAGE_PARAMS,
+    'r2v': _SHOT_TYPE_PARAMS + (('seed', None, None),),
+}
+
 
 class TaskHandler:
     """任务通用处理器
@@ -30,43 +56,24 @@ class TaskHandler:
         }
         
         # 根据任务类型添加特定参数
-        if task_type in ['i2v', 't2v', 'kf2v']:
-            params['resolution'] = request_data.get('resolution', '720P')
-            params['duration'] = int(request_data.get('duration', 5))
-            params['audio'] = request_data.get('audio', False)
-            params['audio_url'] = request_data.get('audio_url', '')
-            params['watermark'] = request_data.get('watermark', False)
-            
-        if task_type in ['i2v', 'kf2v']:
-            params['prompt_extend'] = request_data.get('prompt_extend', True)
-            
-        if task_type in ['t2i', 'i2i']:
-            params['size'] = request_data.get('size', '1024*1024')
-            params['n'] = request_data.get('n', 1)
-            params['watermark'] = request_data.get('watermark', False)
-            params['prompt_extend'] = request_data.get('prompt_extend', True)
-            
-        if task_type in ['t2v', 'r2v', 'i2v']:
-            params['shot_type'] = request_data.get('shot_type', 'single')
-            
-        if task_type == 'r2v':
-            params['seed'] = request_data.get('seed')
-            
+        for key, default, convert in _TASK_EXTRA_PARAMS.get(task_type, ()):
+            value = request_data.get(key, default)
+            params[key] = convert(value) if convert else value
+        
         return params
     
     @staticmethod
     def prepare_batch_info(batch_count):
         """准备批次信息
         
-        生成batch_id，验证批次数量
+        生成batch_id。批次数量应已由 extract_task_params 校验，此处不再重复校验
         
         Args:
-            batch_count: 批次数量
+            batch_count: 已校验的批次数量
             
         Returns:
-            (batch_id, validated_batch_count)
+            (batch_id, batch_count)
         """
-        batch_count = validate_batch_count(batch_count)
         batch_id = str(uuid.uuid4()) if batch_count > 1 else None
         return batch_id, batch_count
     
@@ -95,6 +102,65 @@ class TaskHandler:
             
         return response
     
+    @staticmethod
+    def group_batch_thumbnails(tasks, thumbnail_fields):
+        """按批次分组构建缩略图列表
+        
+        单次遍历，保持任务原有顺序；每个批次只保留第一个完成的任务作为代表，
+        其余完成的任务只累加 batch_completed
+        
+        Args:
+            tasks: 任务列表
+            thumbnail_fields: 函数，接收任务返回缩略图展示字段（poster_url、type等），
+                              返回None表示跳过该任务
+            
+        Returns:
+            缩略图列表
+        """
+        thumbnails = []
+        batch_idx = {}  # batch_id -> thumbnails 中的下标
+        
+        for task in tasks:
+            if task.get('task_status') != 'SUCCEEDED':
+                continue
+            
+            fields = thumbnail_fields(task)
+            if fields is None:
+                continue
+            
+            batch_id = task.get('batch_id')
+            if batch_id:
+                if batch_id in batch_idx:
+                    thumbnails[batch_idx[batch_id]]['batch_completed'] += 1
+                    continue
+                batch_idx[batch_id] = len(thumbnails)
+            
+            thumbnail = {
+                'task_id': task['task_id'],
+                'batch_id': batch_id or None,
+                'batch_total': task.get('batch_total', 1) if batch_id else 1,
+                'batch_completed': 1
+            }
+            thumbnail.update(fields)
+            thumbnails.append(thumbnail)
+        
+        return thumbnails
+    
+    @staticmethod
+    def image_thumbnail_fields(task):
+        """图片类任务的缩略图字段：使用第一张图，优先本地图片
+        
+        Args:
+            task: 任务字典
+            
+        Returns:
+            缩略图字段字典，没有图片时返回None
+        """
+        poster_url = (task.get('local_image_urls') or task.get('image_urls') or [''])[0]
+        if not poster_url:
+            return None
+        return {'poster_url': poster_url, 'type': 'image'}
+    
     @staticmethod
     def add_task_urls(task, task_type, api_key_hash):
         """添加任务相关的URL信息
@@ -1,9 +1,78 @@
 """文件处理服务"""
+import io
 import os
+import shutil
+import tempfile
 import time
-import uuid
+import secrets
+from types import MappingProxyType
 from config import Config
 
+# 上传文件写盘时的复制缓冲区大小
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+
+# 上传类型 -> 上传目录 (导入时构建一次，只读)
+_UPLOAD_DIRS = MappingProxyType({
+    'i2v_image': Config.UPLOAD_I2V_DIR,
+    'i2i_image': Config.UPLOAD_I2I_DIR,
+    'kf2v_image': Config.UPLOAD_KF2V_DIR,
+    'r2v_video': Config.UPLOAD_R2V_DIR,
+    'audio': Config.UPLOAD_AUDIO_DIR,
+    'voice_audio': Config.UPLOAD_VOICE_DIR,
+    'asset_storyboard': Config.ASSETS_STORYBOARD_DIR,
+    'asset_artwork': Config.ASSETS_ARTWORK_DIR,
+    'asset_video': Config.ASSETS_VIDEO_DIR
+})
+
+# 输出类型 -> 输出目录
+_OUTPUT_DIRS = MappingProxyType({
+    'i2v': Config.OUTPUT_I2V_DIR,
+    't2v': Config.OUTPUT_T2V_DIR,
+    't2i': Config.OUTPUT_T2I_DIR,
+    'i2i': Config.OUTPUT_I2I_DIR,
+    'kf2v': Config.OUTPUT_KF2V_DIR,
+    'r2v': Config.OUTPUT_R2V_DIR,
+    'voice': Config.OUTPUT_VOICE_DIR
+})
+
+# 上传类型 -> 文件URL模板 ({h}: 用户哈希, {f}: 文件名)
+_URL_TEMPLATES = MappingProxyType({
+    'i2v_image': '/api/image/i2v/{h}/{f}',
+    'i2i_image': '/api/image/i2i/{h}/{f}',
+    'kf2v_image': '/api/image/kf2v/{h}/{f}',
+    'r2v_video': '/api/video/r2v/{h}/{f}',
+    'audio': '/api/audio/{h}/{f}',
+    'voice_audio': '/api/voice/audio/{h}/{f}',
+})
+
+
+def _split_ext(filename):
+    """拆分文件名和扩展名
+    
+    Returns:
+        (不含扩展名的文件名, 小写扩展名)，无扩展名时扩展名为空字符串
+    """
+    i = filename.rfind('.')
+    if i < 0:
+        return filename, ''
+    return filename[:i], filename[i + 1:].lower()
+
+
+def _disk_fileno(stream):
+    """返回已落盘的上传流的文件描述符，内存中的流返回None
+    
+    werkzeug 以 SpooledTemporaryFile 接收上传文件，超过500KB才写入临时文件；
+    对未落盘的 SpooledTemporaryFile 调用 fileno() 会强制写盘，因此先检查 _rolled
+    """
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        if not stream._rolled:
+            return None
+        stream = stream._file
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
 
 class FileService:
     """文件处理服务
@@ -34,14 +103,8 @@ class FileService:
         if not file or file.filename == '':
             return False, '没有选择文件'
         
-        # 获取文件扩展名
-        original_filename = file.filename
-        ext = ''
-        if '.' in original_filename:
-            ext = original_filename.rsplit('.', 1)[1].lower()
-        
         # 生成新文件名
-        new_filename = self.generate_unique_filename(original_filename, frame_type)
+        new_filename = self.generate_unique_filename(file.filename, frame_type)
         
         # 获取上传目录
         upload_dir = self.get_upload_dir(upload_type)
@@ -55,14 +118,7 @@ class FileService:
         # 保存文件
         filepath = os.path.join(user_dir, new_filename)
         try:
-            file.save(filepath)
-            
-            # 同步到磁盘
-            try:
-                if hasattr(os, 'sync'):
-                    os.sync()
-            except:
-                pass
+            self.save_stream(file, filepath)
             
             # 构建URL
             url = self.build_file_url(upload_type, new_filename, frame_type)
@@ -72,6 +128,39 @@ class FileService:
         except Exception as e:
             return False, f'文件保存失败: {str(e)}'
     
+    @staticmethod
+    def save_stream(file, filepath):
+        """将上传文件流写入磁盘
+        
+        file.save() 使用默认16KB缓冲区复制，多MB文件会产生大量小块读写。
+        上传内容已落在磁盘临时文件时，直接用 sendfile 在内核中复制；
+        仍在内存中(小文件)时以大缓冲区复制。
+        
+        Args:
+            file: Flask上传的文件对象
+            filepath: 目标文件路径
+        """
+        src = file.stream
+        with open(filepath, 'wb', buffering=0) as out:
+            in_fd = _disk_fileno(src)
+            if in_fd is not None and hasattr(os, 'sendfile'):
+                start = src.tell()
+                try:
+                    offset = start
+                    size = os.fstat(in_fd).st_size
+                    while offset < size:
+                        sent = os.sendfile(out.fileno(), in_fd, offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                    return
+                except OSError:
+                    # 文件系统不支持时回退到普通复制
+                    out.seek(0)
+                    out.truncate()
+                    src.seek(start)
+            shutil.copyfileobj(src, out, UPLOAD_COPY_BUFFER_SIZE)
+    
     def generate_unique_filename(self, original_filename, prefix=None):
         """生成唯一文件名
         
@@ -82,12 +171,10 @@ class FileService:
         Returns:
             新文件名
         """
-        ext = ''
-        if '.' in original_filename:
-            ext = original_filename.rsplit('.', 1)[1].lower()
+        _, ext = _split_ext(original_filename)
         
         timestamp = int(time.time())
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = secrets.token_hex(4)
         
         if prefix:
             filename = f"{timestamp}_{unique_id}_{prefix}.{ext}" if ext else f"{timestamp}_{unique_id}_{prefix}"
@@ -105,18 +192,7 @@ class FileService:
         Returns:
             上传目录路径或None
         """
-        upload_dirs = {
-            'i2v_image': Config.UPLOAD_I2V_DIR,
-            'i2i_image': Config.UPLOAD_I2I_DIR,
-            'kf2v_image': Config.UPLOAD_KF2V_DIR,
-            'r2v_video': Config.UPLOAD_R2V_DIR,
-            'audio': Config.UPLOAD_AUDIO_DIR,
-            'voice_audio': Config.UPLOAD_VOICE_DIR,
-            'asset_storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'asset_artwork': Config.ASSETS_ARTWORK_DIR,
-            'asset_video': Config.ASSETS_VIDEO_DIR
-        }
-        return upload_dirs.get(upload_type)
+        return _UPLOAD_DIRS.get(upload_type)
     
     def get_output_dir(self, output_type):
         """获取输出目录
@@ -127,16 +203,7 @@ class FileService:
         Returns:
             输出目录路径或None
         """
-        output_dirs = {
-            'i2v': Config.OUTPUT_I2V_DIR,
-            't2v': Config.OUTPUT_T2V_DIR,
-            't2i': Config.OUTPUT_T2I_DIR,
-            'i2i': Config.OUTPUT_I2I_DIR,
-            'kf2v': Config.OUTPUT_KF2V_DIR,
-            'r2v': Config.OUTPUT_R2V_DIR,
-            'voice': Config.OUTPUT_VOICE_DIR
-        }
-        return output_dirs.get(output_type)
+        return _OUTPUT_DIRS.get(output_type)
     
     def build_file_url(self, upload_type, filename, frame_type=None):
         """构建文件URL
@@ -149,20 +216,12 @@ class FileService:
         Returns:
             文件URL
         """
-        url_patterns = {
-            'i2v_image': f'/api/image/i2v/{self.api_key_hash}/{filename}',
-            'i2i_image': f'/api/image/i2i/{self.api_key_hash}/{filename}',
-            'kf2v_image': f'/api/image/kf2v/{self.api_key_hash}/{filename}',
-            'r2v_video': f'/api/video/r2v/{self.api_key_hash}/{filename}',
-            'audio': f'/api/audio/{self.api_key_hash}/{filename}',
-            'voice_audio': f'/api/voice/audio/{self.api_key_hash}/{filename}',
-        }
-        
         if upload_type.startswith('asset_'):
             category = upload_type.replace('asset_', '')
             return f'/api/assets/{category}/{self.api_key_hash}/{filename}'
         
-        return url_patterns.get(upload_type, f'/api/file/{self.api_key_hash}/{filename}')
+        template = _URL_TEMPLATES.get(upload_type, '/api/file/{h}/{f}')
+        return template.format(h=self.api_key_hash, f=filename)
     
     def validate_file(self, file, allowed_extensions):
         """验证文件类型和大小
@@ -177,11 +236,10 @@ class FileService:
         if not file or file.filename == '':
             return False, '没有选择文件'
         
-        filename = file.filename
-        if '.' not in filename:
+        _, ext = _split_ext(file.filename)
+        if not ext:
             return False, '无效的文件名'
         
-        ext = filename.rsplit('.', 1)[1].lower()
         if ext not in allowed_extensions:
             return False, f'不支持的文件格式，仅支持: {", ".join(allowed_extensions)}'
         
@@ -198,8 +256,6 @@ class FileService:
         Returns:
             (success, result) - result为新文件名或错误信息
         """
-        import shutil
-        
         if not os.path.exists(source_path):
             return False, '源文件不存在'
         
@@ -217,7 +273,7 @@ class FileService:
         target_path = os.path.join(user_dir, target_filename)
         
         try:
-            shutil.copy2(source_path, target_path)
+            shutil.copyfile(source_path, target_path)
             return True, target_filename
         except Exception as e:
             return False, f'文件复制失败: {str(e)}'
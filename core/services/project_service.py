@@ -1,8 +1,95 @@
 """项目管理服务"""
 import os
 import json
+import functools
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from config import Config
+from core.utils.logger import setup_logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_loads = orjson.loads
+    
+    def _json_dumps(obj):
+        """序列化为带缩进的UTF-8 JSON字节串"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+else:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj):
+        """序列化为带缩进的UTF-8 JSON字节串"""
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _atomic_write(path, data):
+    """先写临时文件再 os.replace 覆盖目标，写入中途失败不会留下半截JSON
+    
+    临时文件名带进程号和线程号，多个线程/worker 同时保存同一文件时各写各的临时文件，
+    以最后一次 os.replace 为准；文件名保持 <原文件名>.tmp 结尾，资产列表会跳过它。
+    不做 fsync，交给页缓存落盘
+    """
+    dirname, basename = os.path.split(path)
+    tmp_path = os.path.join(dirname, f'.{os.getpid()}-{threading.get_ident()}.{basename}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _index_by_name(projects):
+    """建立 项目名称 -> 项目 的索引 (同名时保留列表中靠前的一项)"""
+    return {p['name']: p for p in reversed(projects)}
+
+
+def _json_needles(value):
+    """字符串在 JSON 文本中可能出现的字节形式 (原样 UTF-8 与 \\u 转义两种写法)"""
+    return tuple({
+        json.dumps(value, ensure_ascii=False)[1:-1].encode('utf-8'),
+        json.dumps(value)[1:-1].encode('ascii'),
+    })
+
+
+def _read_meta(meta_path, needles=None):
+    """读取并解析元数据文件，无法解析或不是对象时返回 None
+    
+    指定 needles 时先在原始字节中查找，均未出现则不做 JSON 解析直接返回 None
+    """
+    try:
+        with open(meta_path, 'rb') as f:
+            data = f.read()
+        if needles is not None and not any(needle in data for needle in needles):
+            return None
+        meta = _json_loads(data)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning('读取资产元数据失败 %s: %s', meta_path, e)
+        return None
+    return meta if isinstance(meta, dict) else None
+
+
+logger = setup_logger(__name__)
+
+
+# 资产分类 -> 资产目录
+_ASSET_DIRS = MappingProxyType({
+    'storyboard': Config.ASSETS_STORYBOARD_DIR,
+    'artwork': Config.ASSETS_ARTWORK_DIR,
+    'video': Config.ASSETS_VIDEO_DIR
+})
 
 
 class ProjectService:
@@ -11,6 +98,21 @@ class ProjectService:
     负责项目和分集的管理
     """
     
+    # 类级别的项目列表缓存: projects_file -> ((st_mtime_ns, st_size), projects)
+    # 服务实例按请求创建，缓存需跨实例共享；文件被外部修改时按 mtime/size 失效
+    _projects_cache = {}
+    _projects_cache_lock = threading.Lock()
+    
+    # 类级别的资产项目索引: api_key_hash -> (资产目录签名, {project: 资产数量})
+    # 首次查询时扫描一次元数据建立；资产目录 mtime 变化（上传、删除、原子写入）
+    # 或经由本服务写入元数据时失效
+    _asset_index = {}
+    _asset_index_lock = threading.Lock()
+    
+    # 元数据文件较多时并行读取，重叠各文件 open/read 的等待
+    _META_PARALLEL_THRESHOLD = 32
+    _meta_read_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='meta-read')
+    
     def __init__(self, api_key_hash):
         """初始化项目服务
         
@@ -21,6 +123,9 @@ class ProjectService:
         self.projects_dir = os.path.join(Config.CACHE_DIR, 'projects')
         os.makedirs(self.projects_dir, exist_ok=True)
         self.projects_file = os.path.join(self.projects_dir, f'{api_key_hash}_projects.json')
+        # 资产分类 -> 当前用户的资产目录，供各遍历方法直接使用
+        self._user_dirs = {category: os.path.join(base_dir, api_key_hash)
+                           for category, base_dir in _ASSET_DIRS.items()}
     
     # ========== 项目管理 ==========
     
@@ -48,7 +153,7 @@ class ProjectService:
         projects = self._load_projects()
         
         # 检查是否已存在
-        if any(p['name'] == project_name for p in projects):
+        if project_name in _index_by_name(projects):
             return False, '项目已存在'
         
         # 添加新项目
@@ -93,20 +198,17 @@ class ProjectService:
         new_name = new_name.strip()
         projects = self._load_projects()
         
+        index = _index_by_name(projects)
+        
         # 检查新名称是否已存在
-        if any(p['name'] == new_name for p in projects):
+        if new_name in index:
             return False, '项目名称已存在'
         
         # 找到并重命名项目
-        found = False
-        for p in projects:
-            if p['name'] == old_name:
-                p['name'] = new_name
-                found = True
-                break
-        
-        if not found:
+        project = index.get(old_name)
+        if project is None:
             return False, '项目不存在'
+        project['name'] = new_name
         
         self._save_projects(projects)
         
@@ -133,15 +235,15 @@ class ProjectService:
         episode_name = episode_name.strip()
         projects = self._load_projects()
         
-        for project in projects:
-            if project['name'] == project_name:
-                if episode_name in project.get('episodes', []):
-                    return False, '分集已存在'
-                project.setdefault('episodes', []).append(episode_name)
-                self._save_projects(projects)
-                return True, project['episodes']
+        project = _index_by_name(projects).get(project_name)
+        if project is None:
+            return False, '项目不存在'
         
-        return False, '项目不存在'
+        if episode_name in project.get('episodes', []):
+            return False, '分集已存在'
+        project.setdefault('episodes', []).append(episode_name)
+        self._save_projects(projects)
+        return True, project['episodes']
     
     def delete_episode(self, project_name, episode_name):
         """删除分集
@@ -155,22 +257,22 @@ class ProjectService:
         """
         projects = self._load_projects()
         
-        for project in projects:
-            if project['name'] == project_name:
-                episodes = project.get('episodes', [])
-                if episode_name in episodes:
-                    episodes.remove(episode_name)
-                    project['episodes'] = episodes
-                    self._save_projects(projects)
-                    
-                    # 清空使用该分集的资产的分集标签
-                    self._clear_asset_episode(project_name, episode_name)
-                    
-                    return True, project['episodes']
-                else:
-                    return False, '分集不存在'
-        
-        return False, '项目不存在'
+        project = _index_by_name(projects).get(project_name)
+        if project is None:
+            return False, '项目不存在'
+        
+        episodes = project.get('episodes', [])
+        if episode_name not in episodes:
+            return False, '分集不存在'
+        
+        episodes.remove(episode_name)
+        project['episodes'] = episodes
+        self._save_projects(projects)
+        
+        # 清空使用该分集的资产的分集标签
+        self._clear_asset_episode(project_name, episode_name)
+        
+        return True, project['episodes']
     
     def rename_episode(self, project_name, old_name, new_name):
         """重命名分集
@@ -189,27 +291,26 @@ class ProjectService:
         new_name = new_name.strip()
         projects = self._load_projects()
         
-        for project in projects:
-            if project['name'] == project_name:
-                episodes = project.get('episodes', [])
-                
-                if new_name in episodes:
-                    return False, '分集名称已存在'
-                
-                if old_name in episodes:
-                    idx = episodes.index(old_name)
-                    episodes[idx] = new_name
-                    project['episodes'] = episodes
-                    self._save_projects(projects)
-                    
-                    # 更新使用该分集的资产的分集标签
-                    updated_count = self._update_asset_episode_name(project_name, old_name, new_name)
-                    
-                    return True, {'episodes': project['episodes'], 'updated_count': updated_count}
-                else:
-                    return False, '分集不存在'
-        
-        return False, '项目不存在'
+        project = _index_by_name(projects).get(project_name)
+        if project is None:
+            return False, '项目不存在'
+        
+        episodes = project.get('episodes', [])
+        
+        if new_name in episodes:
+            return False, '分集名称已存在'
+        
+        if old_name not in episodes:
+            return False, '分集不存在'
+        
+        episodes[episodes.index(old_name)] = new_name
+        project['episodes'] = episodes
+        self._save_projects(projects)
+        
+        # 更新使用该分集的资产的分集标签
+        updated_count = self._update_asset_episode_name(project_name, old_name, new_name)
+        
+        return True, {'episodes': project['episodes'], 'updated_count': updated_count}
     
     # ========== 资产关联 ==========
     
@@ -225,18 +326,8 @@ class ProjectService:
         Returns:
             (success, message)
         """
-        # 读取现有元数据
-        meta_data = self._load_asset_metadata(category, filename)
-        
-        # 更新标签
-        meta_data['project'] = project
-        meta_data['episode'] = episode
-        meta_data['filename'] = filename
-        meta_data['category'] = category
-        
-        # 保存元数据
-        success = self._save_asset_metadata(category, filename, meta_data)
-        if not success:
+        user_dir = self._get_asset_dir(category)
+        if not user_dir or not self._apply_asset_tags(user_dir, category, filename, project, episode):
             return False, '保存元数据失败'
         
         # 如果项目/分集不存在，自动添加到项目列表
@@ -256,8 +347,8 @@ class ProjectService:
         Returns:
             (success, message)
         """
-        updated_count = 0
-        
+        # 按分类分组 (同一资产只处理一次)，每个分类的用户目录只解析一次
+        grouped = {}
         for asset in assets:
             category = asset.get('category')
             filename = asset.get('filename')
@@ -265,18 +356,17 @@ class ProjectService:
             if not category or not filename:
                 continue
             
-            # 读取现有元数据
-            meta_data = self._load_asset_metadata(category, filename)
-            
-            # 更新标签
-            meta_data['project'] = project
-            meta_data['episode'] = episode
-            meta_data['filename'] = filename
-            meta_data['category'] = category
+            grouped.setdefault(category, {})[filename] = None
+        
+        updated_count = 0
+        for category, filenames in grouped.items():
+            user_dir = self._get_asset_dir(category)
+            if not user_dir:
+                continue
             
-            # 保存元数据
-            if self._save_asset_metadata(category, filename, meta_data):
-                updated_count += 1
+            for filename in filenames:
+                if self._apply_asset_tags(user_dir, category, filename, project, episode):
+                    updated_count += 1
         
         # 如果项目/分集不存在，自动添加到项目列表
         if project:
@@ -293,200 +383,207 @@ class ProjectService:
         Returns:
             资产数量
         """
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
-        count = 0
-        for cat, base_dir in category_dirs.items():
-            user_dir = os.path.join(base_dir, self.api_key_hash)
-            if not os.path.exists(user_dir):
-                continue
-            
-            for filename in os.listdir(user_dir):
-                if not filename.endswith('.meta.json'):
-                    continue
-                
-                meta_path = os.path.join(user_dir, filename)
-                try:
-                    with open(meta_path, 'r', encoding='utf-8') as f:
-                        meta = json.load(f)
-                    
-                    if meta.get('project') == project_name:
-                        count += 1
-                except:
-                    pass
-        
-        return count
+        return self._get_asset_index().get(project_name, 0)
     
     # ========== 私有方法 ==========
     
     def _load_projects(self):
-        """加载项目列表"""
-        if os.path.exists(self.projects_file):
-            try:
-                with open(self.projects_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        """加载项目列表
+        
+        文件未变化时返回缓存的副本，调用方可以直接修改返回值
+        """
+        try:
+            st = os.stat(self.projects_file)
+        except FileNotFoundError:
+            return []
+        
+        version = (st.st_mtime_ns, st.st_size)
+        with ProjectService._projects_cache_lock:
+            cached = ProjectService._projects_cache.get(self.projects_file)
+        if cached and cached[0] == version:
+            return self._copy_projects(cached[1])
+        
+        # 缓存未命中时以同一文件描述符读取内容和版本，避免 stat 与读取之间文件被替换
+        try:
+            with open(self.projects_file, 'rb') as f:
+                st = os.fstat(f.fileno())
+                projects = _json_loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return []
+        
+        version = (st.st_mtime_ns, st.st_size)
+        with ProjectService._projects_cache_lock:
+            ProjectService._projects_cache[self.projects_file] = (version, self._copy_projects(projects))
+        return projects
     
     def _save_projects(self, projects):
         """保存项目列表"""
-        with open(self.projects_file, 'w', encoding='utf-8') as f:
-            json.dump(projects, f, ensure_ascii=False, indent=2)
+        try:
+            _atomic_write(self.projects_file, _json_dumps(projects))
+            st = os.stat(self.projects_file)
+        except BaseException:
+            with ProjectService._projects_cache_lock:
+                ProjectService._projects_cache.pop(self.projects_file, None)
+            raise
+        
+        with ProjectService._projects_cache_lock:
+            ProjectService._projects_cache[self.projects_file] = (
+                (st.st_mtime_ns, st.st_size), self._copy_projects(projects)
+            )
+    
+    @staticmethod
+    def _copy_projects(projects):
+        """复制项目列表 (项目只有一层字段和分集列表，比 deepcopy 快得多)"""
+        return [{**p, 'episodes': list(p['episodes'])} if 'episodes' in p else dict(p) for p in projects]
     
     def _get_asset_dir(self, category):
         """获取资产目录"""
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        base_dir = category_dirs.get(category)
-        if not base_dir:
-            return None
-        return os.path.join(base_dir, self.api_key_hash)
+        return self._user_dirs.get(category)
     
-    def _load_asset_metadata(self, category, filename):
-        """加载资产元数据"""
-        user_dir = self._get_asset_dir(category)
-        if not user_dir:
-            return {}
+    def _asset_dirs_signature(self):
+        """当前用户各资产目录的 mtime 签名，目录内增删或替换文件时会变化"""
+        signature = []
+        for user_dir in self._user_dirs.values():
+            try:
+                signature.append(os.stat(user_dir).st_mtime_ns)
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _get_asset_index(self):
+        """获取当前用户的 项目 -> 资产数量 索引
+        
+        签名未变化时直接复用；否则扫描一次全部元数据重建
+        """
+        # 先取签名再扫描，扫描期间的写入会让下次查询重新建立索引
+        signature = self._asset_dirs_signature()
+        with self._asset_index_lock:
+            cached = self._asset_index.get(self.api_key_hash)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        counts = {}
+        for _, meta in self._iter_meta_files():
+            project = meta.get('project')
+            counts[project] = counts.get(project, 0) + 1
+        
+        with self._asset_index_lock:
+            self._asset_index[self.api_key_hash] = (signature, counts)
+        return counts
+    
+    def _invalidate_asset_index(self):
+        """使当前用户的资产索引失效"""
+        with self._asset_index_lock:
+            self._asset_index.pop(self.api_key_hash, None)
+    
+    def _apply_asset_tags(self, user_dir, category, filename, project, episode):
+        """为资产设置项目/分集标签
+        
+        直接读取元数据文件 (不存在或无法解析时视为空)，标签未变化时不重写
         
+        Returns:
+            标签是否已是目标值
+        """
         meta_path = os.path.join(user_dir, filename + '.meta.json')
-        if os.path.exists(meta_path):
+        meta_data = _read_meta(meta_path) or {}
+        if meta_data.get('project') == project and meta_data.get('episode') == episode:
+            return True
+        
+        meta_data['project'] = project
+        meta_data['episode'] = episode
+        # filename/category 创建后不变，仅在缺失时补齐
+        meta_data.setdefault('filename', filename)
+        meta_data.setdefault('category', category)
+        
+        return self._write_meta_file(meta_path, meta_data)
+    
+    def _iter_meta_files(self, contains=None):
+        """遍历当前用户所有资产的元数据文件
+        
+        使用 os.scandir 单次遍历各资产目录收集 .meta.json，每个文件只读取解析一次；
+        文件数达到阈值时交给线程池并行读取。无法解析的文件直接跳过
+        
+        Args:
+            contains: 可选，只返回原始内容中包含该字符串的文件，
+                      其余文件只做子串查找而不解析 JSON
+        
+        Yields:
+            (meta_path, meta_dict)
+        """
+        meta_paths = []
+        for user_dir in self._user_dirs.values():
             try:
-                with open(meta_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-    
-    def _save_asset_metadata(self, category, filename, meta_data):
-        """保存资产元数据"""
-        user_dir = self._get_asset_dir(category)
-        if not user_dir:
-            return False
+                entries = os.scandir(user_dir)
+            except FileNotFoundError:
+                continue
+            
+            with entries:
+                meta_paths.extend(entry.path for entry in entries if entry.name.endswith('.meta.json'))
+        
+        read = _read_meta if contains is None else functools.partial(_read_meta, needles=_json_needles(contains))
+        if len(meta_paths) < self._META_PARALLEL_THRESHOLD:
+            metas = map(read, meta_paths)
+        else:
+            metas = self._meta_read_executor.map(read, meta_paths)
+        
+        for meta_path, meta in zip(meta_paths, metas):
+            if meta is not None:
+                yield meta_path, meta
+    
+    def _write_meta_file(self, meta_path, meta):
+        """写回资产元数据文件 (一次编码、一次写入)
         
-        meta_path = os.path.join(user_dir, filename + '.meta.json')
+        Returns:
+            是否成功
+        """
         try:
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, ensure_ascii=False, indent=2)
+            _atomic_write(meta_path, _json_dumps(meta))
             return True
-        except:
+        except (OSError, TypeError) as e:
+            logger.warning('写入资产元数据失败 %s: %s', meta_path, e)
             return False
+        finally:
+            # 目录 mtime 精度不足时也能保证索引不会读到旧值
+            self._invalidate_asset_index()
     
     def _update_asset_project_name(self, old_name, new_name):
         """更新资产的项目名称"""
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
         updated_count = 0
-        for cat, base_dir in category_dirs.items():
-            user_dir = os.path.join(base_dir, self.api_key_hash)
-            if not os.path.exists(user_dir):
-                continue
-            
-            for filename in os.listdir(user_dir):
-                if not filename.endswith('.meta.json'):
-                    continue
-                
-                meta_path = os.path.join(user_dir, filename)
-                try:
-                    with open(meta_path, 'r', encoding='utf-8') as f:
-                        meta = json.load(f)
-                    
-                    if meta.get('project') == old_name:
-                        meta['project'] = new_name
-                        with open(meta_path, 'w', encoding='utf-8') as f:
-                            json.dump(meta, f, ensure_ascii=False, indent=2)
-                        updated_count += 1
-                except:
-                    pass
+        for meta_path, meta in self._iter_meta_files(contains=old_name):
+            if meta.get('project') == old_name:
+                meta['project'] = new_name
+                if self._write_meta_file(meta_path, meta):
+                    updated_count += 1
         
         return updated_count
     
     def _clear_asset_episode(self, project_name, episode_name):
         """清空资产的分集标签"""
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
-        for cat, base_dir in category_dirs.items():
-            user_dir = os.path.join(base_dir, self.api_key_hash)
-            if not os.path.exists(user_dir):
-                continue
-            
-            for filename in os.listdir(user_dir):
-                if not filename.endswith('.meta.json'):
-                    continue
-                
-                meta_path = os.path.join(user_dir, filename)
-                try:
-                    with open(meta_path, 'r', encoding='utf-8') as f:
-                        meta = json.load(f)
-                    
-                    if meta.get('project') == project_name and meta.get('episode') == episode_name:
-                        meta['episode'] = ''
-                        with open(meta_path, 'w', encoding='utf-8') as f:
-                            json.dump(meta, f, ensure_ascii=False, indent=2)
-                except:
-                    pass
+        for meta_path, meta in self._iter_meta_files(contains=project_name):
+            if meta.get('project') == project_name and meta.get('episode') == episode_name:
+                meta['episode'] = ''
+                self._write_meta_file(meta_path, meta)
     
     def _update_asset_episode_name(self, project_name, old_name, new_name):
         """更新资产的分集名称"""
-        category_dirs = {
-            'storyboard': Config.ASSETS_STORYBOARD_DIR,
-            'artwork': Config.ASSETS_ARTWORK_DIR,
-            'video': Config.ASSETS_VIDEO_DIR
-        }
-        
         updated_count = 0
-        for cat, base_dir in category_dirs.items():
-            user_dir = os.path.join(base_dir, self.api_key_hash)
-            if not os.path.exists(user_dir):
-                continue
-            
-            for filename in os.listdir(user_dir):
-                if not filename.endswith('.meta.json'):
-                    continue
-                
-                meta_path = os.path.join(user_dir, filename)
-                try:
-                    with open(meta_path, 'r', encoding='utf-8') as f:
-                        meta = json.load(f)
-                    
-                    if meta.get('project') == project_name and meta.get('episode') == old_name:
-                        meta['episode'] = new_name
-                        with open(meta_path, 'w', encoding='utf-8') as f:
-                            json.dump(meta, f, ensure_ascii=False, indent=2)
-                        updated_count += 1
-                except:
-                    pass
+        for meta_path, meta in self._iter_meta_files(contains=project_name):
+            if meta.get('project') == project_name and meta.get('episode') == old_name:
+                meta['episode'] = new_name
+                if self._write_meta_file(meta_path, meta):
+                    updated_count += 1
         
         return updated_count
     
     def _ensure_project_exists(self, project_name, episode_name=None):
         """确保项目存在，不存在则自动创建"""
         projects = self._load_projects()
-        project_exists = False
-        
-        for p in projects:
-            if p['name'] == project_name:
-                project_exists = True
-                if episode_name and episode_name not in p.get('episodes', []):
-                    p.setdefault('episodes', []).append(episode_name)
-                break
+        project = _index_by_name(projects).get(project_name)
         
-        if not project_exists:
+        if project is not None:
+            if episode_name and episode_name not in project.get('episodes', []):
+                project.setdefault('episodes', []).append(episode_name)
+        else:
             new_project = {
                 'name': project_name,
                 'episodes': [episode_name] if episode_name else [],
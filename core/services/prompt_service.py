@@ -1,9 +1,59 @@
 """提示词优化服务"""
 import os
 import base64
+import functools
+import json
+import mmap
+import threading
 from flask import Response
 from openai import OpenAI
 from config import Config
+from core.handlers.media_handler import MediaHandler
+from core.utils.logger import setup_logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+else:
+    def _json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+
+logger = setup_logger(__name__)
+
+# SSE 帧的固定部分
+_SSE_PREFIX = b'data: '
+_SSE_SUFFIX = b'\n\n'
+_SSE_DONE = b'data: [DONE]\n\n'
+
+# 图片识别结果缓存: (path, st_mtime_ns, st_size) -> description
+_DESCRIPTION_CACHE_MAX_SIZE = 256
+_description_cache = {}
+_description_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=8)
+def _encode_image(image_path, mtime_ns, size):
+    """读取图片并编码为 data URL
+    
+    以 (路径, mtime, 大小) 为键缓存，文件变化后自动失效；
+    单个结果可达数 MB，缓存条目数保持较小
+    """
+    with open(image_path, 'rb') as f:
+        if size:
+            # 直接对映射内存编码，不再生成一份完整的原始字节对象
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                image_data = base64.b64encode(mm).decode('ascii')
+        else:
+            # 空文件无法映射
+            image_data = ''
+    
+    ext = os.path.splitext(image_path)[1][1:].lower()
+    mime_type = MediaHandler.IMAGE_MIME_TYPES.get(ext, 'image/jpeg')
+    return f"data:{mime_type};base64,{image_data}"
 
 
 class PromptService:
@@ -72,6 +122,9 @@ class PromptService:
 直接输出优化后的提示词，以纯文本格式输出，不要有任何额外的解释或标题。
 """
 
+    # 附带图片识别结果时的图生视频系统提示词前缀
+    I2V_SYSTEM_PROMPT_PREFIX = I2V_SYSTEM_PROMPT + "\n\n# 图片内容\n\n"
+
     # 文生图提示词模板
     T2I_SYSTEM_PROMPT = """
 # 角色
@@ -228,7 +281,7 @@ class PromptService:
                 if image_path and os.path.exists(image_path):
                     image_description = self.analyze_image(image_path)
                     if image_description:
-                        system_prompt = f"{system_prompt}\n\n# 图片内容\n\n{image_description}"
+                        system_prompt = self.I2V_SYSTEM_PROMPT_PREFIX + image_description
                         
         elif task_type == 'text2video':  # 文生视频
             system_prompt = self.T2V_SYSTEM_PROMPT
@@ -248,20 +301,15 @@ class PromptService:
             图片内容描述
         """
         try:
-            # 读取图片并转为base64
-            with open(image_path, 'rb') as f:
-                image_data = base64.b64encode(f.read()).decode('utf-8')
+            # 同一图片反复优化时复用识别结果，跳过远程调用
+            st = os.stat(image_path)
+            cache_key = (image_path, st.st_mtime_ns, st.st_size)
+            with _description_cache_lock:
+                description = _description_cache.get(cache_key)
+            if description:
+                return description
             
-            # 获取图片扩展名
-            ext = os.path.splitext(image_path)[1].lower()
-            mime_type_map = {
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png',
-                '.webp': 'image/webp',
-                '.bmp': 'image/bmp'
-            }
-            mime_type = mime_type_map.get(ext, 'image/jpeg')
+            image_url = _encode_image(*cache_key)
             
             # 调用qwen-vl API
             completion = self.client.chat.completions.create(
@@ -273,7 +321,7 @@ class PromptService:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_data}"
+                                    "url": image_url
                                 }
                             },
                             {
@@ -287,13 +335,18 @@ class PromptService:
             )
             
             description = completion.choices[0].message.content.strip()
-            print(f"[INFO] 图片识别结果: {description}")
+            logger.info('图片识别结果: %s', description)
+            
+            if description:
+                with _description_cache_lock:
+                    # 缓存满时淘汰最早写入的条目
+                    if len(_description_cache) >= _DESCRIPTION_CACHE_MAX_SIZE:
+                        del _description_cache[next(iter(_description_cache))]
+                    _description_cache[cache_key] = description
             return description
             
-        except Exception as e:
-            print(f"[ERROR] qwen-vl 图片识别失败: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('qwen-vl 图片识别失败')
             return ""
     
     def stream_optimize(self, system_prompt, user_prompt):
@@ -326,33 +379,30 @@ class PromptService:
                         content = chunk.choices[0].delta.content or ""
                         if content:
                             # 使用SSE格式发送数据
-                            yield f"data: {content}\n\n"
+                            yield _SSE_PREFIX + content.encode('utf-8') + _SSE_SUFFIX
                     elif chunk.usage:
                         # 发送使用量信息（可选）
-                        import json
                         usage_info = {
                             "type": "usage",
                             "prompt_tokens": chunk.usage.prompt_tokens,
                             "completion_tokens": chunk.usage.completion_tokens,
                             "total_tokens": chunk.usage.total_tokens
                         }
-                        yield f"data: {json.dumps(usage_info)}\n\n"
+                        yield _SSE_PREFIX + _json_dumps(usage_info) + _SSE_SUFFIX
                 
                 # 发送结束信号
-                yield "data: [DONE]\n\n"
+                yield _SSE_DONE
                 
             except Exception as e:
-                import json
                 error_msg = {"type": "error", "message": str(e)}
-                yield f"data: {json.dumps(error_msg)}\n\n"
-                print(f"流式优化提示词失败: {e}")
-                import traceback
-                traceback.print_exc()
+                yield _SSE_PREFIX + _json_dumps(error_msg) + _SSE_SUFFIX
+                logger.exception('流式优化提示词失败')
         
         # 返回流式响应
         return Response(
             generate(),
             mimetype='text/event-stream',
+            direct_passthrough=True,
             headers={
                 'Cache-Control': 'no-cache',
                 'X-Accel-Buffering': 'no'
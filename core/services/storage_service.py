@@ -5,9 +5,52 @@
 import os
 import time
 import json
-from typing import Optional, Any, List
+import mmap
+import random
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, List, Union
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# gevent 下让出协程,避免等待期间占住 worker
+try:
+    from gevent import sleep as _sleep
+except ImportError:
+    _sleep = time.sleep
+
+# macOS 等平台没有 fdatasync,回退到 fsync
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+# 超过该大小的 JSON 文件通过 mmap 直接解析,避免额外的读缓冲拷贝
+MMAP_READ_THRESHOLD = 64 * 1024
+
+
+def _load_json_file(file_path: str) -> Any:
+    """
+    读取并解析 JSON 文件
+    
+    orjson 可直接解析 bytes/memoryview,大文件映射到内存后原地解析;
+    未安装 orjson 时回退到标准库
+    """
+    with open(file_path, 'rb') as f:
+        if orjson is None:
+            return json.loads(f.read())
+        if os.fstat(f.fileno()).st_size < MMAP_READ_THRESHOLD:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
 
 class StorageService:
     """
@@ -15,6 +58,20 @@ class StorageService:
     处理OSS挂载目录(ossfs)的文件同步延迟和并发问题
     """
     
+    # 获取锁的重试间隔: 从 5ms 开始指数退避，上限 200ms，并加入 ±25% 抖动
+    LOCK_RETRY_INITIAL_DELAY = 0.005
+    LOCK_RETRY_MAX_DELAY = 0.2
+    
+    # 等待 ossfs 同步的轮询间隔: 从 5ms 开始指数退避
+    SYNC_POLL_INITIAL_DELAY = 0.005
+    
+    # 读取重试间隔: 从 10ms 开始指数退避,上限 200ms
+    READ_RETRY_INITIAL_DELAY = 0.01
+    READ_RETRY_MAX_DELAY = 0.2
+    
+    # 目录列表缓存的最大条目数,超出时淘汰最久未使用的目录
+    DIR_CACHE_MAX_ENTRIES = 1024
+    
     def __init__(self, cache_dir: str = './cache'):
         """
         初始化存储服务
@@ -25,20 +82,29 @@ class StorageService:
         self.cache_dir = cache_dir
         self.sync_enabled = os.getenv('STORAGE_SYNC_ENABLED', 'true').lower() == 'true'
         self.sync_delay = float(os.getenv('STORAGE_SYNC_DELAY', '0.05'))  # 50ms
+        # 仅在 ossfs 挂载模式下写入后等待同步延迟
+        self.ossfs_mode = os.getenv('STORAGE_OSSFS_MODE', 'false').lower() == 'true'
         self.read_retry = int(os.getenv('STORAGE_READ_RETRY', '3'))
         self.lock_timeout = int(os.getenv('STORAGE_LOCK_TIMEOUT', '30'))
         
-        # 目录列表缓存
-        self._dir_cache = {}
+        # 目录列表缓存(LRU): dir_path -> (files, names, timestamp)
+        # names 为 files 的集合形式,供 file_exists 直接判断
+        self._dir_cache = OrderedDict()
         self._dir_cache_ttl = int(os.getenv('DIR_LIST_CACHE_TTL', '30'))
+        self._dir_cache_lock = threading.Lock()
+        self._dir_refreshing = set()
+        
+        # 已持有的 flock 锁: lock_path -> fd
+        self._held_locks = {}
+        self._held_locks_lock = threading.Lock()
     
-    def write_file(self, file_path: str, content: str, sync: bool = True) -> bool:
+    def write_file(self, file_path: str, content: Union[str, bytes], sync: bool = True) -> bool:
         """
         写入文件(支持OSS挂载同步)
         
         Args:
             file_path: 文件路径
-            content: 文件内容
+            content: 文件内容(字符串按UTF-8编码,也可直接传入字节串)
             sync: 是否强制同步
             
         Returns:
@@ -48,29 +114,29 @@ class StorageService:
             # 确保目录存在
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
+            data = content.encode('utf-8') if isinstance(content, str) else content
+            
             # 写入到临时文件
             temp_path = file_path + '.tmp'
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-                f.flush()
+            fd = os.open(temp_path, os.O_CREAT | os.O_TRUNC | os.O_WRONLY | os.O_CLOEXEC, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
                 
-                # 强制刷盘
+                # 数据刷盘(元数据由 rename 落盘,无需完整 fsync)
                 if sync and self.sync_enabled:
-                    os.fsync(f.fileno())
+                    _fdatasync(fd)
+            finally:
+                os.close(fd)
             
             # 原子重命名
             os.replace(temp_path, file_path)
+            self.invalidate_prefix(os.path.dirname(file_path))
             
-            # 同步到FUSE层
-            if sync and self.sync_enabled:
-                try:
-                    if hasattr(os, 'sync'):
-                        os.sync()
-                except:
-                    pass
-                
-                # 等待OSS同步完成
-                time.sleep(self.sync_delay)
+            # 等待OSS同步完成
+            if sync and self.sync_enabled and self.ossfs_mode and self.sync_delay > 0:
+                self._wait_for_sync(file_path, len(data))
             
             return True
             
@@ -78,6 +144,27 @@ class StorageService:
             print(f"[ERROR] 写入文件失败 {file_path}: {e}")
             return False
     
+    def _wait_for_sync(self, file_path: str, expected_size: int):
+        """
+        等待 ossfs 上的文件大小与写入内容一致
+        
+        首次检查即命中时立即返回;否则指数退避轮询,最多等待 sync_delay 的 4 倍
+        """
+        deadline = time.monotonic() + self.sync_delay * 4
+        delay = self.SYNC_POLL_INITIAL_DELAY
+        while True:
+            try:
+                if os.stat(file_path).st_size == expected_size:
+                    return
+            except FileNotFoundError:
+                pass
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            _sleep(min(delay, remaining))
+            delay *= 2
+    
     def read_file(self, file_path: str, retry: bool = True) -> Optional[str]:
         """
         读取文件(支持重试)
@@ -89,29 +176,81 @@ class StorageService:
         Returns:
             文件内容或None
         """
-        max_retries = self.read_retry if retry else 1
+        if not retry:
+            return self.read_file_if_exists(file_path)
+        return self._read_with_retry(file_path, self._read_text)
+    
+    def read_bytes(self, file_path: str, retry: bool = True) -> Optional[bytes]:
+        """
+        以二进制方式读取文件(支持重试)
         
-        for attempt in range(max_retries):
+        Args:
+            file_path: 文件路径
+            retry: 是否启用重试
+            
+        Returns:
+            文件内容或None
+        """
+        return self._read_with_retry(file_path, self._read_binary, retry)
+    
+    @staticmethod
+    def _read_text(file_path: str) -> str:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    @staticmethod
+    def _read_binary(file_path: str) -> bytes:
+        with open(file_path, 'rb') as f:
+            return f.read()
+    
+    def _read_with_retry(self, file_path: str, reader, retry: bool = True):
+        """
+        调用 reader 读取文件,文件不存在时指数退避重试
+        
+        Args:
+            file_path: 文件路径
+            reader: 读取函数,文件不存在时抛出 FileNotFoundError
+            retry: 是否启用重试
+            
+        Returns:
+            reader 的返回值或None
+        """
+        attempts = self.read_retry if retry else 1
+        delay = self.READ_RETRY_INITIAL_DELAY
+        for attempt in range(attempts):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return f.read()
+                return reader(file_path)
             except FileNotFoundError:
-                if attempt < max_retries - 1:
-                    # 文件可能还未同步,等待后重试
-                    time.sleep(0.1 * (attempt + 1))
-                    continue
-                else:
-                    return None
+                # 文件可能还未同步,退避后重试
+                pass
             except Exception as e:
                 print(f"[ERROR] 读取文件失败 {file_path}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(0.1 * (attempt + 1))
-                    continue
-                else:
-                    return None
+            
+            if attempt < attempts - 1:
+                time.sleep(delay)
+                delay = min(delay * 2, self.READ_RETRY_MAX_DELAY)
         
         return None
     
+    def read_file_if_exists(self, file_path: str) -> Optional[str]:
+        """
+        读取文件,不存在时返回None(单次 open,不做存在性预检查)
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            文件内容或None
+        """
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[ERROR] 读取文件失败 {file_path}: {e}")
+            return None
+    
     def write_json(self, file_path: str, data: Any, sync: bool = True) -> bool:
         """
         写入JSON文件
@@ -125,7 +264,7 @@ class StorageService:
             是否成功
         """
         try:
-            content = json.dumps(data, ensure_ascii=False, indent=2)
+            content = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
             return self.write_file(file_path, content, sync)
         except Exception as e:
             print(f"[ERROR] 写入JSON失败 {file_path}: {e}")
@@ -142,25 +281,38 @@ class StorageService:
         Returns:
             解析后的数据或None
         """
-        content = self.read_file(file_path, retry)
-        if content is None:
-            return None
-        
+        return self._read_with_retry(file_path, self._read_json_once, retry)
+    
+    @staticmethod
+    def _read_json_once(file_path: str) -> Optional[Any]:
         try:
-            return json.loads(content)
-        except Exception as e:
+            return _load_json_file(file_path)
+        except ValueError as e:
+            # 内容损坏时重试无意义,直接返回
             print(f"[ERROR] 解析JSON失败 {file_path}: {e}")
             return None
     
     def file_exists(self, file_path: str) -> bool:
-        """检查文件是否存在"""
+        """检查文件是否存在
+        
+        所在目录的列表缓存未过期时直接查缓存(含不存在的结果),不再访问文件系统。
+        需要读取内容时直接调用 read_* 方法,不要先调用本方法判断
+        """
+        dir_path, name = os.path.split(file_path)
+        with self._dir_cache_lock:
+            cached = self._dir_cache.get(dir_path)
+        if cached is not None and time.time() - cached[2] < self._dir_cache_ttl:
+            return name in cached[1]
         return os.path.exists(file_path)
     
     def delete_file(self, file_path: str) -> bool:
         """删除文件"""
         try:
-            if os.path.exists(file_path):
+            try:
                 os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            self.invalidate_prefix(os.path.dirname(file_path))
             return True
         except Exception as e:
             print(f"[ERROR] 删除文件失败 {file_path}: {e}")
@@ -177,37 +329,70 @@ class StorageService:
         Returns:
             文件列表
         """
-        # 检查缓存
-        if use_cache and dir_path in self._dir_cache:
-            cached_data, timestamp = self._dir_cache[dir_path]
-            if time.time() - timestamp < self._dir_cache_ttl:
-                return cached_data
+        if not use_cache:
+            return self._scan_directory(dir_path)
         
-        # 读取目录
+        # 检查缓存: 过期条目继续返回旧结果,同时在后台刷新
+        with self._dir_cache_lock:
+            cached = self._dir_cache.get(dir_path)
+            if cached is not None:
+                self._dir_cache.move_to_end(dir_path)
+                files, _, timestamp = cached
+                if time.time() - timestamp >= self._dir_cache_ttl and dir_path not in self._dir_refreshing:
+                    self._dir_refreshing.add(dir_path)
+                    threading.Thread(target=self._refresh_directory, args=(dir_path,), daemon=True).start()
+                return files
+        
+        files = self._scan_directory(dir_path)
+        self._cache_directory(dir_path, files)
+        return files
+    
+    def _scan_directory(self, dir_path: str) -> List[str]:
+        """读取目录项名称(os.scandir 直接返回名称,无需逐项 stat)"""
         try:
-            if not os.path.exists(dir_path):
-                return []
-            
-            files = os.listdir(dir_path)
-            
-            # 更新缓存
-            if use_cache:
-                self._dir_cache[dir_path] = (files, time.time())
-            
-            return files
-            
+            with os.scandir(dir_path) as entries:
+                return [entry.name for entry in entries]
+        except FileNotFoundError:
+            return []
         except Exception as e:
             print(f"[ERROR] 列举目录失败 {dir_path}: {e}")
             return []
     
+    def _cache_directory(self, dir_path: str, files: List[str]):
+        """写入目录列表缓存,超出容量时淘汰最久未使用的条目"""
+        with self._dir_cache_lock:
+            self._dir_cache[dir_path] = (files, frozenset(files), time.time())
+            self._dir_cache.move_to_end(dir_path)
+            while len(self._dir_cache) > self.DIR_CACHE_MAX_ENTRIES:
+                self._dir_cache.popitem(last=False)
+    
+    def _refresh_directory(self, dir_path: str):
+        """后台刷新过期的目录列表缓存"""
+        try:
+            self._cache_directory(dir_path, self._scan_directory(dir_path))
+        finally:
+            with self._dir_cache_lock:
+                self._dir_refreshing.discard(dir_path)
+    
     def invalidate_cache(self, dir_path: str):
         """失效目录缓存"""
-        if dir_path in self._dir_cache:
-            del self._dir_cache[dir_path]
+        with self._dir_cache_lock:
+            self._dir_cache.pop(dir_path, None)
+    
+    def invalidate_prefix(self, prefix: str):
+        """失效目录及其所有子目录的缓存"""
+        prefix = prefix.rstrip(os.sep)
+        sub_prefix = prefix + os.sep
+        with self._dir_cache_lock:
+            for path in [p for p in self._dir_cache if p == prefix or p.startswith(sub_prefix)]:
+                del self._dir_cache[path]
     
     def acquire_lock(self, lock_path: str, timeout: Optional[int] = None) -> bool:
         """
-        获取文件锁(基于文件名的乐观锁)
+        获取文件锁
+        
+        本地文件系统使用内核 flock(进程退出自动释放,无过期锁问题);
+        ossfs 挂载模式下 flock 无法跨主机生效,使用基于文件名的乐观锁
         
         Args:
             lock_path: 锁文件路径
@@ -216,10 +401,14 @@ class StorageService:
         Returns:
             是否成功获取锁
         """
+        if fcntl is not None and not self.ossfs_mode:
+            return self.acquire_flock(lock_path, timeout)
+        
         if timeout is None:
             timeout = self.lock_timeout
         
         start_time = time.time()
+        delay = self.LOCK_RETRY_INITIAL_DELAY
         
         while True:
             try:
@@ -238,26 +427,30 @@ class StorageService:
                 
             except FileExistsError:
                 # 锁已存在,检查是否过期
-                if os.path.exists(lock_path):
-                    try:
-                        stat = os.stat(lock_path)
-                        lock_age = time.time() - stat.st_mtime
-                        
-                        # 锁过期,强制删除
-                        if lock_age > self.lock_timeout:
-                            print(f"[WARN] 检测到过期锁,强制删除: {lock_path}")
-                            os.remove(lock_path)
-                            continue
-                    except:
-                        pass
+                try:
+                    stat = os.stat(lock_path)
+                    lock_age = time.time() - stat.st_mtime
+                    
+                    # 锁过期,强制删除
+                    if lock_age > self.lock_timeout:
+                        print(f"[WARN] 检测到过期锁,强制删除: {lock_path}")
+                        os.remove(lock_path)
+                        delay = self.LOCK_RETRY_INITIAL_DELAY
+                        continue
+                except FileNotFoundError:
+                    # 锁刚被释放,立即重试
+                    continue
+                except OSError:
+                    pass
                 
                 # 检查超时
                 if time.time() - start_time > timeout:
                     print(f"[ERROR] 获取锁超时: {lock_path}")
                     return False
                 
-                # 等待后重试
-                time.sleep(0.1)
+                # 退避等待后重试
+                time.sleep(delay * (0.75 + random.random() * 0.5))
+                delay = min(delay * 2, self.LOCK_RETRY_MAX_DELAY)
                 
             except Exception as e:
                 print(f"[ERROR] 获取锁失败 {lock_path}: {e}")
@@ -265,11 +458,80 @@ class StorageService:
     
     def release_lock(self, lock_path: str):
         """释放文件锁"""
+        if self.release_flock(lock_path):
+            return
+        
         try:
             if os.path.exists(lock_path):
                 os.remove(lock_path)
         except Exception as e:
             print(f"[WARN] 释放锁失败 {lock_path}: {e}")
+    
+    def acquire_flock(self, lock_path: str, timeout: Optional[int] = None) -> bool:
+        """
+        获取 flock 文件锁(同一主机内的进程/线程互斥)
+        
+        Args:
+            lock_path: 锁文件路径
+            timeout: 超时时间(秒)
+            
+        Returns:
+            是否成功获取锁
+        """
+        if timeout is None:
+            timeout = self.lock_timeout
+        
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR | os.O_CLOEXEC, 0o644)
+        except OSError as e:
+            print(f"[ERROR] 获取锁失败 {lock_path}: {e}")
+            return False
+        
+        start_time = time.time()
+        delay = self.LOCK_RETRY_INITIAL_DELAY
+        
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                os.close(fd)
+                print(f"[ERROR] 获取锁失败 {lock_path}: {e}")
+                return False
+            
+            # 检查超时
+            if time.time() - start_time > timeout:
+                os.close(fd)
+                print(f"[ERROR] 获取锁超时: {lock_path}")
+                return False
+            
+            # 非阻塞重试,避免阻塞 gevent 事件循环
+            time.sleep(delay * (0.75 + random.random() * 0.5))
+            delay = min(delay * 2, self.LOCK_RETRY_MAX_DELAY)
+        
+        with self._held_locks_lock:
+            self._held_locks[lock_path] = fd
+        return True
+    
+    def release_flock(self, lock_path: str) -> bool:
+        """
+        释放 flock 文件锁(锁文件保留,删除会让等待者锁住已解除链接的文件)
+        
+        Returns:
+            是否持有并释放了该锁
+        """
+        with self._held_locks_lock:
+            fd = self._held_locks.pop(lock_path, None)
+        if fd is None:
+            return False
+        
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+        return True
 
 
 # 全局存储服务实例
@@ -1,8 +1,7 @@
 """
 Flask应用工厂
 """
-from flask import Flask
-import os
+from flask import Flask, jsonify
 
 
 def create_app(config_name='default'):
@@ -24,12 +23,8 @@ def create_app(config_name='default'):
     from config import Config
     app.config.from_object(Config)
     
-    # 确保缓存目录存在
-    os.makedirs(Config.CACHE_DIR, exist_ok=True)
-    os.makedirs(os.path.join(Config.CACHE_DIR, 'images'), exist_ok=True)
-    os.makedirs(os.path.join(Config.CACHE_DIR, 'videos'), exist_ok=True)
-    os.makedirs(os.path.join(Config.CACHE_DIR, 'tasks'), exist_ok=True)
-    os.makedirs(os.path.join(Config.CACHE_DIR, 'kf2v_tasks'), exist_ok=True)
+    # 创建缓存目录结构
+    Config.init_app(app)
     
     # 注册蓝图
     register_blueprints(app)
@@ -58,12 +53,10 @@ def register_error_handlers(app):
     
     @app.errorhandler(404)
     def not_found(error):
-        from flask import jsonify
         return jsonify({'success': False, 'error': {'code': 'NOT_FOUND', 'message': '资源不存在'}}), 404
     
     @app.errorhandler(500)
     def internal_error(error):
-        from flask import jsonify
         return jsonify({'success': False, 'error': {'code': 'INTERNAL_ERROR', 'message': '服务器内部错误'}}), 500
 
 
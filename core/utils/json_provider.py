@@ -0,0 +1,38 @@
+"""基于 orjson 的 Flask JSON 提供器"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """使用 orjson 进行 JSON 序列化/反序列化
+
+    jsonify() 和 request.get_json() 都会经过应用的 JSON 提供器，
+    替换后所有接口无需修改即可使用 C 实现的 orjson。
+    未安装 orjson 或传入了 orjson 不支持的参数（如 indent）时回退到默认实现。
+    """
+
+    if orjson is not None:
+        _options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # 调试模式下保留默认的缩进输出
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
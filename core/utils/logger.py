@@ -8,23 +8,43 @@
 - 开发/生产环境自适应
 """
 
+import atexit
 import logging
 import logging.handlers
 import json
+import queue
 import sys
 import os
-from datetime import datetime
+import threading
+import time
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+else:
+    def _json_dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
 
 class StructuredFormatter(logging.Formatter):
     """结构化JSON日志格式化器"""
     
     def format(self, record: logging.LogRecord) -> str:
         """格式化日志记录为JSON"""
+        # 使用记录创建时间(格式化在后台线程完成，不能取当前时间)
+        timestamp = '%s.%06dZ' % (
+            time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)),
+            int((record.created % 1) * 1_000_000)
+        )
         log_data = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': timestamp,
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -50,7 +70,7 @@ class StructuredFormatter(logging.Formatter):
                 'function': record.funcName
             }
         
-        return json.dumps(log_data, ensure_ascii=False)
+        return _json_dumps(log_data)
 
 
 class ColoredFormatter(logging.Formatter):
@@ -64,19 +84,17 @@ class ColoredFormatter(logging.Formatter):
         'CRITICAL': '\033[35m', # 紫色
     }
     RESET = '\033[0m'
+    # 预先拼好带颜色的级别字段
+    COLORED_LEVELS = {name: f"{color}{name:8}\033[0m" for name, color in COLORS.items()}
     
     def format(self, record: logging.LogRecord) -> str:
         """格式化日志为彩色输出"""
-        color = self.COLORS.get(record.levelname, '')
-        
         # 基础信息
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        level = f"{color}{record.levelname:8}{self.RESET}"
-        logger_name = f"{record.name:30}"
-        message = record.getMessage()
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created))
+        level = self.COLORED_LEVELS.get(record.levelname) or f"{record.levelname:8}{self.RESET}"
         
         # 构建输出
-        output = f"{timestamp} | {level} | {logger_name} | {message}"
+        output = f"{timestamp} | {level} | {record.name:30} | {record.getMessage()}"
         
         # 添加上下文信息
         if hasattr(record, 'context') and record.context:
@@ -95,32 +113,35 @@ class ColoredFormatter(logging.Formatter):
         return output
 
 
-def setup_logger(name: str, level: str = None) -> logging.Logger:
-    """设置并返回日志器
-    
-    Args:
-        name: 日志器名称(通常使用__name__)
-        level: 日志级别(DEBUG/INFO/WARNING/ERROR/CRITICAL)
-    
-    Returns:
-        配置好的日志器实例
+class _QueueHandler(logging.handlers.QueueHandler):
+    """只在调用线程中完成消息插值的队列处理器
+
+    默认的 QueueHandler.prepare 会在调用线程中完成整条日志的格式化并丢弃异常信息，
+    这里只固化消息参数，格式化(含异常堆栈)与IO交给后台监听线程
     """
-    logger = logging.getLogger(name)
-    
-    # 避免重复配置
-    if logger.handlers:
-        return logger
-    
-    # 从环境变量获取配置
-    env = os.getenv('FLASK_ENV', 'development')
-    log_level = level or os.getenv('LOG_LEVEL', 'DEBUG' if env == 'development' else 'INFO')
-    logger.setLevel(getattr(logging, log_level.upper()))
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_log_queue = None
+_log_listener = None
+_log_queue_lock = threading.Lock()
+
+
+def _build_handlers(env: str) -> list:
+    """构建实际执行输出的处理器"""
+    handlers = []
+    # 格式化器无状态，各处理器共用同一实例
+    structured_formatter = StructuredFormatter()
     
     # 开发环境:彩色控制台输出
     if env == 'development':
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(ColoredFormatter())
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
     # 生产环境:JSON文件输出
     else:
@@ -135,9 +156,9 @@ def setup_logger(name: str, level: str = None) -> logging.Logger:
             backupCount=30,  # 保留30个文件
             encoding='utf-8'
         )
-        file_handler.setFormatter(StructuredFormatter())
+        file_handler.setFormatter(structured_formatter)
         file_handler.setLevel(logging.INFO)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
         
         # 错误日志单独文件
         error_handler = logging.handlers.RotatingFileHandler(
@@ -146,15 +167,90 @@ def setup_logger(name: str, level: str = None) -> logging.Logger:
             backupCount=30,
             encoding='utf-8'
         )
-        error_handler.setFormatter(StructuredFormatter())
+        error_handler.setFormatter(structured_formatter)
         error_handler.setLevel(logging.ERROR)
-        logger.addHandler(error_handler)
+        handlers.append(error_handler)
         
         # 控制台也输出ERROR级别
         console_handler = logging.StreamHandler(sys.stderr)
-        console_handler.setFormatter(StructuredFormatter())
+        console_handler.setFormatter(structured_formatter)
         console_handler.setLevel(logging.ERROR)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+    
+    return handlers
+
+
+def _get_log_queue(env: str) -> queue.SimpleQueue:
+    """获取进程内共享的日志队列，首次调用时启动后台监听线程"""
+    global _log_queue, _log_listener
+    
+    if _log_queue is not None:
+        return _log_queue
+    
+    # 多线程同时首次配置日志器时只启动一个监听线程
+    with _log_queue_lock:
+        if _log_queue is None:
+            log_queue = queue.SimpleQueue()
+            _log_listener = logging.handlers.QueueListener(
+                log_queue, *_build_handlers(env), respect_handler_level=True
+            )
+            _log_listener.start()
+            # 进程退出前输出队列中剩余的日志
+            atexit.register(_log_listener.stop)
+            _log_queue = log_queue
+    
+    return _log_queue
+
+
+def restart_log_listener():
+    """在 fork 出的子进程中重新启动日志监听线程
+    
+    线程不会随 fork 复制，预加载应用的 worker 需调用本函数；
+    队列中残留的父进程日志由父进程负责输出，这里直接丢弃。
+    注意：清空的是整个队列，worker 自身在调用本函数之前（fork 之后到 post_worker_init 之间）
+    记录的日志也会一并丢弃
+    """
+    global _log_listener
+    
+    if _log_queue is None:
+        return
+    
+    with _log_queue_lock:
+        while not _log_queue.empty():
+            _log_queue.get_nowait()
+        
+        env = os.getenv('FLASK_ENV', 'development')
+        _log_listener = logging.handlers.QueueListener(
+            _log_queue, *_build_handlers(env), respect_handler_level=True
+        )
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+
+
+def setup_logger(name: str, level: str = None) -> logging.Logger:
+    """设置并返回日志器
+    
+    日志器只挂载队列处理器，请求线程仅负责入队，
+    格式化和写文件/控制台由后台监听线程完成
+    
+    Args:
+        name: 日志器名称(通常使用__name__)
+        level: 日志级别(DEBUG/INFO/WARNING/ERROR/CRITICAL)
+    
+    Returns:
+        配置好的日志器实例
+    """
+    logger = logging.getLogger(name)
+    
+    # 避免重复配置
+    if logger.handlers:
+        return logger
+    
+    # 从环境变量获取配置
+    env = os.getenv('FLASK_ENV', 'development')
+    log_level = level or os.getenv('LOG_LEVEL', 'DEBUG' if env == 'development' else 'INFO')
+    logger.setLevel(getattr(logging, log_level.upper()))
+    logger.addHandler(_QueueHandler(_get_log_queue(env)))
     
     return logger
 
@@ -173,21 +269,19 @@ def log_with_context(logger: logging.Logger, level: str, message: str,
         extra: 额外字段(性能指标等)
         exc_info: 是否包含异常堆栈
     """
-    # 创建日志记录
-    log_record = logger.makeRecord(
-        logger.name,
-        getattr(logging, level.upper()),
-        '(unknown file)', 0, message, (), None
-    )
+    levelno = getattr(logging, level.upper())
+    # 级别被过滤时不创建日志记录
+    if not logger.isEnabledFor(levelno):
+        return
     
-    # 添加上下文和额外字段
+    # 上下文和额外字段作为记录属性注入
+    record_extra = {}
     if context:
-        log_record.context = context
+        record_extra['context'] = context
     if extra:
-        log_record.extra_data = extra
+        record_extra['extra_data'] = extra
     
-    # 处理日志
-    logger.handle(log_record)
+    logger._log(levelno, message, (), exc_info=exc_info, extra=record_extra, stacklevel=2)
 
 
 # 预配置的日志器
@@ -1,8 +1,25 @@
 """
 统一响应格式化
+
+带时间戳和错误码的响应格式;序列化统一复用 response_helper 的 JSON 构建路径
 """
-from flask import jsonify
-from datetime import datetime
+import time
+
+from core.utils.response_helper import json_response
+
+# 秒级缓存的时间戳: [秒, 格式化字符串]
+_ts_cache = [0, '']
+
+
+def _now_iso():
+    """返回当前本地时间的 ISO 格式字符串(秒级精度,同一秒内复用)"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        # 先生成字符串再更新秒数,避免并发读到新秒数配旧字符串
+        ts = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now))
+        _ts_cache[1] = ts
+        _ts_cache[0] = now
+    return _ts_cache[1]
 
 
 def success_response(data=None, message='操作成功', **kwargs):
@@ -17,18 +34,9 @@ def success_response(data=None, message='操作成功', **kwargs):
     Returns:
         JSON响应
     """
-    response = {
-        'success': True,
-        'message': message,
-        'timestamp': datetime.now().isoformat()
-    }
-    
     if data is not None:
-        response['data'] = data
-    
-    response.update(kwargs)
-    
-    return jsonify(response)
+        kwargs.setdefault('data', data)
+    return json_response({'success': True, 'message': message, 'timestamp': _now_iso(), **kwargs})
 
 
 def error_response(message='操作失败', code='ERROR', status_code=400, **kwargs):
@@ -44,15 +52,9 @@ def error_response(message='操作失败', code='ERROR', status_code=400, **kwar
     Returns:
         JSON响应和状态码
     """
-    response = {
+    return json_response({
         'success': False,
-        'error': {
-            'code': code,
-            'message': message
-        },
-        'timestamp': datetime.now().isoformat()
-    }
-    
-    response.update(kwargs)
-    
-    return jsonify(response), status_code
+        'error': {'code': code, 'message': message},
+        'timestamp': _now_iso(),
+        **kwargs
+    }), status_code
@@ -1,5 +1,40 @@
 """响应辅助工具"""
-from flask import jsonify, Response
+import functools
+import json
+from flask import jsonify, request, Response
+from core.utils.logger import setup_logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 预序列化的无消息成功响应体
+_OK_BODY = json.dumps({'success': True}).encode('utf-8')
+
+
+@functools.lru_cache(maxsize=256)
+def _ok_body(message):
+    """序列化带消息的成功响应体（消息多为固定文案，按消息缓存）"""
+    return json.dumps({'success': True, 'message': message}, ensure_ascii=False).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """直接用 orjson 序列化构建 JSON 响应
+    
+    跳过 jsonify 的参数解析与提供器分派；未安装 orjson 或数据无法序列化时回退到 jsonify
+    """
+    if orjson is not None:
+        try:
+            body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+        else:
+            return Response(body, status=status, mimetype='application/json')
+    
+    response = jsonify(payload)
+    response.status_code = status
+    return response
 
 
 def success_response(data=None, message='操作成功'):
@@ -15,7 +50,40 @@ def success_response(data=None, message='操作成功'):
     response = {'success': True, 'message': message}
     if data is not None:
         response.update(data if isinstance(data, dict) else {'data': data})
-    return jsonify(response)
+    return json_response(response)
+
+
+def ok(message=None):
+    """构建仅包含 success/message 的成功响应
+    
+    响应体预先序列化并缓存，适用于返回固定提示文案的高频接口
+    
+    Args:
+        message: 成功消息（可选）
+        
+    Returns:
+        JSON响应对象
+    """
+    body = _OK_BODY if message is None else _ok_body(message)
+    return Response(body, mimetype='application/json')
+
+
+def conditional_json(payload):
+    """构建带 ETag 的 JSON 响应，内容未变化时返回 304
+    
+    适用于前端频繁轮询且结果多数时候不变的列表接口
+    
+    Args:
+        payload: 响应数据
+        
+    Returns:
+        JSON响应对象（或空body的304响应）
+    """
+    response = json_response(payload)
+    # 允许浏览器缓存，但每次使用前都需向服务端验证
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 def error_response(message='操作失败', code=400):
@@ -28,7 +96,7 @@ def error_response(message='操作失败', code=400):
     Returns:
         JSON响应对象和状态码
     """
-    return jsonify({'success': False, 'message': message}), code
+    return json_response({'success': False, 'message': message}), code
 
 
 def paginated_response(items, page, limit, total, has_more=None):
@@ -55,7 +123,7 @@ def paginated_response(items, page, limit, total, has_more=None):
     if has_more is not None:
         response['has_more'] = has_more
     
-    return jsonify(response)
+    return json_response(response)
 
 
 def stream_response(generator, mimetype='text/event-stream'):
@@ -76,3 +144,34 @@ def stream_response(generator, mimetype='text/event-stream'):
             'X-Accel-Buffering': 'no'
         }
     )
+
+
+def json_errors(action, message='操作失败', code=200, **extra):
+    """装饰器：将路由中未捕获的异常转换为JSON错误响应
+    
+    替代每个路由中重复的 try/except 样板代码
+    
+    Args:
+        action: 操作描述，用于日志（如 '获取项目列表'）
+        message: 返回给前端的错误消息前缀
+        code: HTTP状态码
+        **extra: 错误响应中附带的额外字段
+        
+    Returns:
+        装饰器函数
+    """
+    def decorator(f):
+        # 使用被装饰路由所在模块的日志器，便于定位出错的蓝图
+        logger = setup_logger(f.__module__)
+        
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            except Exception as e:
+                logger.exception('%s失败', action)
+                return json_response({'success': False, 'message': f'{message}: {str(e)}', **extra}), code
+        
+        return decorated_function
+    
+    return decorator
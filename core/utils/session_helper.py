@@ -1,22 +1,27 @@
 """Session 辅助工具"""
-from flask import session
+from flask import g, jsonify, session
 import hashlib
-from functools import wraps
+from functools import lru_cache, wraps
 
 
 def get_api_key():
-    """从session获取API Key"""
-    return session.get('api_key')
+    """获取API Key（优先使用 require_auth 缓存在 g 上的值）"""
+    api_key = g.get('api_key')
+    return api_key if api_key is not None else session.get('api_key')
 
 
 def get_api_key_hash():
-    """从session获取API Key哈希"""
-    return session.get('api_key_hash')
+    """获取API Key哈希（优先使用 require_auth 缓存在 g 上的值）"""
+    api_key_hash = g.get('api_key_hash')
+    return api_key_hash if api_key_hash is not None else session.get('api_key_hash')
 
 
+@lru_cache(maxsize=256)
 def generate_api_key_hash(api_key: str) -> str:
     """生成API Key哈希
     
+    哈希值同时是用户缓存目录名，算法不可更改；结果按 API Key 缓存
+    
     Args:
         api_key: API Key字符串
         
@@ -33,14 +38,16 @@ def require_auth(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        from flask import jsonify
-        
-        api_key = get_api_key()
-        api_key_hash = get_api_key_hash()
+        api_key = session.get('api_key')
+        api_key_hash = session.get('api_key_hash')
         
         if not api_key or not api_key_hash:
             return jsonify({'success': False, 'message': '请先输入API Key'}), 401
-            
+        
+        # 缓存到请求上下文，路由内的 get_api_key/get_api_key_hash 不再访问 session
+        g.api_key = api_key
+        g.api_key_hash = api_key_hash
+        
         return f(*args, **kwargs)
     
     return decorated_function
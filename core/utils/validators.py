@@ -1,4 +1,5 @@
 """参数验证工具"""
+import functools
 
 
 def validate_required(data, fields):
@@ -53,16 +54,21 @@ def validate_batch_count(count, max_count=4):
     Returns:
         validated_count (限制在1到max_count之间)
     """
-    try:
-        count = int(count)
-    except (TypeError, ValueError):
-        count = 1
+    # 路由中多已是 int，只对其他类型做转换
+    if not isinstance(count, int):
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            count = 1
     
+    if 1 <= count <= max_count:
+        return count
     return max(1, min(max_count, count))
 
 
+@functools.lru_cache(maxsize=256)
 def validate_pagination(page, limit, max_limit=50):
-    """验证分页参数
+    """验证分页参数（结果按参数缓存，参数需可哈希）
     
     Args:
         page: 页码
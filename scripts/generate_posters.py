@@ -22,11 +22,59 @@ sys.path.insert(0, str(project_root))
 
 from config import Config
 
+# 可选依赖: PyAV 在进程内解码，省去每个视频启动一次 ffmpeg 的开销
+# (frame.to_image() 需要 Pillow)；未安装时使用 ffmpeg 命令行
+try:
+    import av
+    import PIL  # noqa: F401
+except ImportError:
+    av = None
+
+POSTER_SEEK_SECONDS = 0.5
+POSTER_HEIGHT = 360
+
+
+def generate_poster_av(video_path: str, poster_path: str) -> bool:
+    """
+    使用 PyAV 在进程内截取第0.5秒的帧作为封面图
+    
+    Args:
+        video_path: 视频文件路径
+        poster_path: 封面图输出路径
+        
+    Returns:
+        是否成功
+    """
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        # 多个视频并发处理，每个解码器只用单线程
+        stream.codec_context.thread_count = 1
+        
+        if stream.time_base:
+            container.seek(int(POSTER_SEEK_SECONDS / stream.time_base), stream=stream)
+        
+        # seek 落在目标时间之前的关键帧，继续解码到目标时间
+        frame = None
+        for frame in container.decode(stream):
+            if frame.time is None or frame.time >= POSTER_SEEK_SECONDS:
+                break
+        
+        if frame is None:
+            return False
+        
+        width = max(1, round(frame.width * POSTER_HEIGHT / frame.height))
+        image = frame.to_image().resize((width, POSTER_HEIGHT))
+    
+    image.save(poster_path, 'JPEG', quality=85)
+    return True
+
 
 def generate_poster(video_path: str, poster_path: str) -> bool:
     """
     从视频生成封面图
     
+    优先使用 PyAV，失败或未安装时回退到 ffmpeg 命令行
+    
     Args:
         video_path: 视频文件路径
         poster_path: 封面图输出路径
@@ -37,10 +85,21 @@ def generate_poster(video_path: str, poster_path: str) -> bool:
     if os.path.exists(poster_path):
         return True  # 已存在，跳过
     
+    if av is not None:
+        try:
+            if generate_poster_av(video_path, poster_path):
+                return True
+        except Exception as e:
+            print(f"  ⚠️ PyAV 处理失败，回退到 ffmpeg: {e}")
+    
     try:
         # 使用 ffmpeg 提取第0.5秒的帧
+        # 多个 ffmpeg 并发运行，每个进程只用单线程避免争抢 CPU
         cmd = [
             'ffmpeg',
+            '-nostdin',
+            '-loglevel', 'error',
+            '-threads', '1',
             '-ss', '0.5',
             '-i', video_path,
             '-vframes', '1',
@@ -63,18 +122,17 @@ def generate_poster(video_path: str, poster_path: str) -> bool:
         return False
 
 
-def process_user_videos(user_video_dir: str) -> tuple:
+def collect_user_jobs(user_video_dir: str) -> tuple:
     """
-    处理单个用户的所有视频
+    收集单个用户需要生成封面图的视频
     
     Args:
         user_video_dir: 用户视频目录路径
         
     Returns:
-        (成功数, 失败数, 跳过数)
+        ([(video_path, poster_path), ...], 跳过数)
     """
-    success_count = 0
-    fail_count = 0
+    jobs = []
     skip_count = 0
     
     # 创建 posters 目录
@@ -95,15 +153,43 @@ def process_user_videos(user_video_dir: str) -> tuple:
             skip_count += 1
             continue
         
-        # 生成封面图
-        if generate_poster(video_path, poster_path):
-            success_count += 1
-            print(f"  ✅ {task_id}")
-        else:
-            fail_count += 1
-            print(f"  ❌ {task_id}")
+        jobs.append((video_path, poster_path))
     
-    return success_count, fail_count, skip_count
+    return jobs, skip_count
+
+
+def run_jobs(jobs: list, workers: int) -> tuple:
+    """
+    并发生成封面图
+    
+    ffmpeg 在子进程中运行，线程池即可让多个 ffmpeg 并行
+    
+    Args:
+        jobs: [(video_path, poster_path), ...]
+        workers: 并发数
+        
+    Returns:
+        (成功数, 失败数)
+    """
+    success_count = 0
+    fail_count = 0
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(generate_poster, video_path, poster_path): video_path
+            for video_path, poster_path in jobs
+        }
+        
+        for future in as_completed(futures):
+            task_id = os.path.basename(futures[future]).replace('.mp4', '')
+            if future.result():
+                success_count += 1
+                print(f"  ✅ {task_id}")
+            else:
+                fail_count += 1
+                print(f"  ❌ {task_id}")
+    
+    return success_count, fail_count
 
 
 def main():
@@ -112,19 +198,23 @@ def main():
     print("=" * 50)
     print()
     
-    # 检查 ffmpeg
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True)
-        if result.returncode != 0:
+    # 检查解码后端: 已安装 PyAV 时不强制要求 ffmpeg
+    if av is not None:
+        print("✅ 使用 PyAV 生成封面图")
+    else:
+        try:
+            result = subprocess.run(['ffmpeg', '-version'], capture_output=True)
+            if result.returncode != 0:
+                print("❌ ffmpeg 未安装，请先安装 ffmpeg")
+                sys.exit(1)
+        except FileNotFoundError:
             print("❌ ffmpeg 未安装，请先安装 ffmpeg")
+            print("   Ubuntu: sudo apt install ffmpeg")
+            print("   macOS: brew install ffmpeg")
+            print("   或安装 PyAV: pip install av pillow")
             sys.exit(1)
-    except FileNotFoundError:
-        print("❌ ffmpeg 未安装，请先安装 ffmpeg")
-        print("   Ubuntu: sudo apt install ffmpeg")
-        print("   macOS: brew install ffmpeg")
-        sys.exit(1)
-    
-    print("✅ ffmpeg 已安装")
+        
+        print("✅ ffmpeg 已安装")
     
     # 获取缓存目录
     if len(sys.argv) > 1:
@@ -143,9 +233,8 @@ def main():
     print()
     
     # 统计
-    total_success = 0
-    total_fail = 0
     total_skip = 0
+    all_jobs = []
     
     # 处理 i2v 和 kf2v 两个目录
     for task_type in ['i2v', 'kf2v']:
@@ -169,14 +258,16 @@ def main():
             if video_count == 0:
                 continue
             
-            print(f"  📂 处理用户 {user_hash[:8]}... ({video_count} 个视频)")
-            
-            success, fail, skip = process_user_videos(user_video_dir)
-            total_success += success
-            total_fail += fail
+            jobs, skip = collect_user_jobs(user_video_dir)
+            all_jobs.extend(jobs)
             total_skip += skip
             
-            print(f"     新生成: {success}, 失败: {fail}, 已存在: {skip}")
+            print(f"  📂 用户 {user_hash[:8]}... ({video_count} 个视频, 待生成: {len(jobs)}, 已存在: {skip})")
+    
+    # 所有用户的视频统一排队并发生成
+    workers = os.cpu_count() or 4
+    print(f"\n🚀 开始生成 {len(all_jobs)} 个封面图 (并发数: {workers})...")
+    total_success, total_fail = run_jobs(all_jobs, workers)
     
     # 总结
     print()
@@ -23,43 +23,53 @@
     └── kf2v/{api_key_hash}/            # kf2v 输出视频
 
 使用方法:
-    python scripts/migrate_cache.py --cache-dir ./cache [--dry-run] [--workers 8]
+    python scripts/migrate_cache.py --cache-dir ./cache [--dry-run] [--workers 8] [--mode hardlink]
 """
 
+import errno
 import os
 import sys
 import shutil
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 import time
 
 
 # 新格式的任务类型目录
 TASK_TYPE_DIRS = {'i2v', 'kf2v', 't2i', 'i2i'}
 
+# 文件迁移方式: hardlink 硬链接(保留旧目录), move 移动, copy 复制
+# 任务 JSON 会被 CacheService 原地改写，硬链接后新旧文件共用一个 inode，旧目录将不再是
+# 可回滚的原始副本，因此 hardlink 只用于不会再被改写的图片/视频，任务文件始终复制
+MIGRATE_MODES = ('hardlink', 'move', 'copy')
+DEFAULT_MIGRATE_MODE = 'hardlink'
+
+
+def task_file_mode(mode: str) -> str:
+    """任务 JSON 文件的迁移方式: hardlink 改为 copy，其余不变"""
+    return 'copy' if mode == 'hardlink' else mode
+
+# 无法硬链接/重命名时回退到复制的错误码（跨文件系统、文件系统不支持等）
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+# sendfile 不可用时的用户态复制缓冲区大小（1 MiB）
+COPY_BUFFER_SIZE = 1 << 20
+
+# sendfile 不支持该文件类型/文件系统时的错误码
+_SENDFILE_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP}
 
-# 线程安全的统计计数器
-class AtomicCounter:
-    def __init__(self):
-        self.value = 0
-        self.lock = Lock()
-    
-    def increment(self, amount=1):
-        with self.lock:
-            self.value += amount
-            return self.value
-    
-    def get(self):
-        with self.lock:
-            return self.value
+
+# 十六进制字符（大小写均可），供 bytes.translate 删除
+_HEX_BYTES = b'0123456789abcdefABCDEF'
 
 
 def is_api_key_hash(dirname: str) -> bool:
     """判断目录名是否是 api_key_hash 格式（16位hex）"""
-    if len(dirname) not in [16, 32]:
+    if len(dirname) not in (16, 32) or not dirname.isascii():
         return False
-    return all(c in '0123456789abcdef' for c in dirname.lower())
+    # 删除所有 hex 字符后为空即全部合法，整个判断在 C 层完成
+    return not dirname.encode('ascii').translate(None, _HEX_BYTES)
 
 
 def ensure_dir(path: str):
@@ -67,9 +77,75 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
-def copy_file_task(src: str, dst: str, dry_run: bool = False) -> tuple:
+def _remove_partial(dst: str):
+    """删除复制失败留下的目标文件，避免重新迁移时被误判为已存在"""
+    try:
+        os.remove(dst)
+    except OSError:
+        pass
+
+
+def copy_file(src: str, dst: str):
     """
-    复制单个文件（用于并发执行）
+    复制文件内容及元数据（等价于 shutil.copy2）
+    
+    目标文件以独占方式创建，已存在时抛出 FileExistsError。
+    POSIX 下优先使用 os.sendfile 在内核态完成复制；不支持时回退到
+    1 MiB 缓冲区的 readinto 循环，减少大文件复制的系统调用次数
+    """
+    with open(src, 'rb') as fsrc:
+        fdst = open(dst, 'xb')
+        try:
+            with fdst:
+                if os.name == 'posix' and hasattr(os, 'sendfile'):
+                    _sendfile_copy(fsrc, fdst)
+                else:
+                    shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+            shutil.copystat(src, dst)
+        except BaseException:
+            _remove_partial(dst)
+            raise
+
+
+def _sendfile_copy(fsrc, fdst):
+    """使用 os.sendfile 复制，不支持时回退到 readinto 循环"""
+    src_fd = fsrc.fileno()
+    dst_fd = fdst.fileno()
+    size = os.fstat(src_fd).st_size
+    offset = 0
+    use_sendfile = True
+    
+    while offset < size:
+        try:
+            sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        except OSError as e:
+            if offset == 0 and e.errno in _SENDFILE_FALLBACK_ERRNOS:
+                use_sendfile = False
+                break
+            raise
+        if sent == 0:
+            # 源文件在复制过程中被截断
+            break
+        offset += sent
+    
+    if not use_sendfile:
+        buf = bytearray(COPY_BUFFER_SIZE)
+        view = memoryview(buf)
+        while True:
+            n = fsrc.readinto(buf)
+            if not n:
+                break
+            fdst.write(view[:n])
+
+
+def copy_file_task(src: str, dst: str, dry_run: bool = False, mode: str = DEFAULT_MIGRATE_MODE) -> tuple:
+    """
+    迁移单个文件（用于并发执行）
+    
+    同一文件系统内通过硬链接只修改目录项，无需复制文件内容；
+    跨文件系统或不支持时回退到复制。move 模式在迁移成功后删除源文件。
+    目标文件已存在时由 link/独占创建直接报错并跳过，不再单独检查；
+    目标目录由 execute_copy_tasks 预先创建
     
     Returns:
         (success, skipped, error_msg)
@@ -77,14 +153,27 @@ def copy_file_task(src: str, dst: str, dry_run: bool = False) -> tuple:
     if dry_run:
         return (True, False, None)
     
-    # 检查目标文件是否已存在
-    if os.path.exists(dst):
-        return (False, True, None)  # 跳过
-    
     try:
-        ensure_dir(os.path.dirname(dst))
-        shutil.copy2(src, dst)
+        linked = False
+        # 符号链接按原行为复制其指向的内容
+        if mode != 'copy' and not os.path.islink(src):
+            try:
+                os.link(src, dst)
+                linked = True
+            except FileExistsError:
+                raise
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+        
+        if not linked:
+            copy_file(src, dst)
+        
+        if mode == 'move':
+            os.remove(src)
         return (True, False, None)
+    except FileExistsError:
+        return (False, True, None)  # 跳过
     except Exception as e:
         return (False, False, str(e))
 
@@ -93,40 +182,40 @@ def find_user_dirs(base_dir: str) -> list:
     """查找目录下的所有 api_key_hash 子目录"""
     user_dirs = []
     
-    if not os.path.exists(base_dir):
+    try:
+        it = os.scandir(base_dir)
+    except FileNotFoundError:
         return user_dirs
     
-    for dirname in os.listdir(base_dir):
-        dirpath = os.path.join(base_dir, dirname)
-        
-        # 跳过新格式的类型目录
-        if dirname in TASK_TYPE_DIRS:
-            continue
-        
-        # 检查是否是目录且是 api_key_hash 格式
-        if os.path.isdir(dirpath) and is_api_key_hash(dirname):
-            user_dirs.append({
-                'dirpath': dirpath,
-                'api_key_hash': dirname
-            })
+    # scandir 的目录项自带文件类型，无需对每个子项再 stat 一次
+    with it:
+        for entry in it:
+            # 跳过新格式的类型目录
+            if entry.name in TASK_TYPE_DIRS:
+                continue
+            
+            # 检查是否是 api_key_hash 格式且是目录
+            if is_api_key_hash(entry.name) and entry.is_dir():
+                user_dirs.append({
+                    'dirpath': entry.path,
+                    'api_key_hash': entry.name
+                })
     
     return user_dirs
 
 
-def collect_copy_tasks(old_dir: str, new_dir: str, extensions: list = None) -> list:
+def collect_copy_tasks(old_dir: str, new_dir: str, extensions: list = None):
     """
-    收集所有需要复制的文件任务
+    逐个产出需要复制的文件任务（边扫描边迁移，不预先生成完整列表）
     
     Args:
         old_dir: 旧目录
         new_dir: 新目录
         extensions: 文件扩展名列表，None表示所有文件
     
-    Returns:
-        [(src, dst), ...]
+    Yields:
+        (src, dst)
     """
-    tasks = []
-    
     user_dirs = find_user_dirs(old_dir)
     
     for ud in user_dirs:
@@ -134,40 +223,33 @@ def collect_copy_tasks(old_dir: str, new_dir: str, extensions: list = None) -> l
         old_user_dir = ud['dirpath']
         new_user_dir = os.path.join(new_dir, api_key_hash)
         
-        if not os.path.isdir(old_user_dir):
-            continue
-        
-        for filename in os.listdir(old_user_dir):
-            src = os.path.join(old_user_dir, filename)
-            
-            if not os.path.isfile(src):
-                continue
-            
-            # 检查扩展名
-            if extensions:
-                if not any(filename.lower().endswith(ext) for ext in extensions):
+        with os.scandir(old_user_dir) as it:
+            for entry in it:
+                filename = entry.name
+                
+                # 检查扩展名
+                if extensions:
+                    if not any(filename.lower().endswith(ext) for ext in extensions):
+                        continue
+                
+                if not entry.is_file():
                     continue
-            
-            dst = os.path.join(new_user_dir, filename)
-            tasks.append((src, dst))
-    
-    return tasks
+                
+                yield (entry.path, os.path.join(new_user_dir, filename))
 
 
-def collect_task_copy_tasks(old_tasks_dir: str, new_tasks_base: str, task_type: str) -> list:
+def collect_task_copy_tasks(old_tasks_dir: str, new_tasks_base: str, task_type: str):
     """
-    收集任务文件复制任务
+    逐个产出任务文件复制任务
     
     Args:
         old_tasks_dir: 旧任务目录 (./cache/tasks 或 ./cache/kf2v_tasks)
         new_tasks_base: 新任务基础目录 (./cache/tasks)
         task_type: 任务类型 ('i2v' 或 'kf2v')
     
-    Returns:
-        [(src, dst), ...]
+    Yields:
+        (src, dst)
     """
-    tasks = []
-    
     user_dirs = find_user_dirs(old_tasks_dir)
     
     for ud in user_dirs:
@@ -175,78 +257,90 @@ def collect_task_copy_tasks(old_tasks_dir: str, new_tasks_base: str, task_type:
         old_user_dir = ud['dirpath']
         new_user_dir = os.path.join(new_tasks_base, task_type, api_key_hash)
         
-        if not os.path.isdir(old_user_dir):
-            continue
-        
-        for filename in os.listdir(old_user_dir):
-            if not filename.endswith('.json'):
-                continue
-            
-            src = os.path.join(old_user_dir, filename)
-            dst = os.path.join(new_user_dir, filename)
-            tasks.append((src, dst))
-    
-    return tasks
+        with os.scandir(old_user_dir) as it:
+            for entry in it:
+                filename = entry.name
+                if not filename.endswith('.json') or not entry.is_file():
+                    continue
+                
+                yield (entry.path, os.path.join(new_user_dir, filename))
 
 
-def execute_copy_tasks(tasks: list, workers: int, dry_run: bool = False) -> dict:
+def execute_copy_tasks(tasks, workers: int, dry_run: bool = False,
+                       mode: str = DEFAULT_MIGRATE_MODE) -> dict:
     """
     并发执行复制任务
     
+    按需从 tasks 中取任务提交，同时在途的任务数不超过 workers 的 2 倍，
+    扫描目录与复制文件交错进行
+    
     Args:
-        tasks: [(src, dst), ...]
+        tasks: 可迭代的 (src, dst)
         workers: 并发线程数
         dry_run: 预览模式
+        mode: 迁移方式 (hardlink/move/copy)
     
     Returns:
         统计信息
     """
     stats = {
-        'total': len(tasks),
+        'total': 0,
         'copied': 0,
         'skipped': 0,
         'errors': 0
     }
     
-    if not tasks:
-        return stats
-    
-    copied = AtomicCounter()
-    skipped = AtomicCounter()
-    errors = AtomicCounter()
+    tasks = iter(tasks)
+    created_dirs = set()
+    # 统计与错误信息只在主线程中更新，无需加锁；错误信息结束后统一输出
+    error_lines = []
     
     with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {
-            executor.submit(copy_file_task, src, dst, dry_run): (src, dst)
-            for src, dst in tasks
-        }
+        pending = {}
+        
+        def submit(batch):
+            for src, dst in batch:
+                # 目标目录在主线程中每个只创建一次，避免每个文件各自 makedirs
+                dst_dir = os.path.dirname(dst)
+                if not dry_run and dst_dir not in created_dirs:
+                    ensure_dir(dst_dir)
+                    created_dirs.add(dst_dir)
+                stats['total'] += 1
+                pending[executor.submit(copy_file_task, src, dst, dry_run, mode)] = (src, dst)
+        
+        submit(islice(tasks, workers * 2))
         
-        for future in as_completed(futures):
-            success, was_skipped, error_msg = future.result()
-            if success:
-                copied.increment()
-            elif was_skipped:
-                skipped.increment()
-            else:
-                errors.increment()
-                if error_msg:
-                    src, dst = futures[future]
-                    print(f"  [ERROR] {os.path.basename(src)}: {error_msg}")
-    
-    stats['copied'] = copied.get()
-    stats['skipped'] = skipped.get()
-    stats['errors'] = errors.get()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                src, dst = pending.pop(future)
+                success, was_skipped, error_msg = future.result()
+                if success:
+                    stats['copied'] += 1
+                elif was_skipped:
+                    stats['skipped'] += 1
+                else:
+                    stats['errors'] += 1
+                    if error_msg:
+                        error_lines.append(f"  [ERROR] {os.path.basename(src)}: {error_msg}")
+            
+            submit(islice(tasks, len(done)))
+    
+    if error_lines:
+        print('\n'.join(error_lines), flush=True)
     
     return stats
 
 
-def migrate_all(cache_dir: str, workers: int = 8, dry_run: bool = False):
+def migrate_all(cache_dir: str, workers: int = 8, dry_run: bool = False,
+                mode: str = DEFAULT_MIGRATE_MODE):
     """执行完整迁移"""
     print("=" * 60)
     print("缓存数据迁移脚本 (并发版)")
     print("=" * 60)
     print(f"缓存目录: {cache_dir}")
     print(f"并发线程: {workers}")
+    print(f"迁移方式: {mode} (任务文件: {task_file_mode(mode)})")
     print(f"模式: {'预览模式 (不执行实际操作)' if dry_run else '执行模式'}")
     print()
     
@@ -268,10 +362,10 @@ def migrate_all(cache_dir: str, workers: int = 8, dry_run: bool = False):
     
     if os.path.exists(old_tasks_dir):
         tasks = collect_task_copy_tasks(old_tasks_dir, new_tasks_dir, 'i2v')
-        print(f"  发现 {len(tasks)} 个文件...")
+        stats = execute_copy_tasks(tasks, workers, dry_run, task_file_mode(mode))
+        print(f"  发现 {stats['total']} 个文件")
         
-        if tasks:
-            stats = execute_copy_tasks(tasks, workers, dry_run)
+        if stats['total']:
             total_stats['i2v_tasks'] = stats['copied']
             total_stats['skipped'] += stats['skipped']
             total_stats['errors'] += stats['errors']
@@ -286,10 +380,10 @@ def migrate_all(cache_dir: str, workers: int = 8, dry_run: bool = False):
     
     if os.path.exists(old_kf2v_tasks_dir):
         tasks = collect_task_copy_tasks(old_kf2v_tasks_dir, new_tasks_dir, 'kf2v')
-        print(f"  发现 {len(tasks)} 个文件...")
+        stats = execute_copy_tasks(tasks, workers, dry_run, task_file_mode(mode))
+        print(f"  发现 {stats['total']} 个文件")
         
-        if tasks:
-            stats = execute_copy_tasks(tasks, workers, dry_run)
+        if stats['total']:
             total_stats['kf2v_tasks'] = stats['copied']
             total_stats['skipped'] += stats['skipped']
             total_stats['errors'] += stats['errors']
@@ -306,10 +400,10 @@ def migrate_all(cache_dir: str, workers: int = 8, dry_run: bool = False):
     
     if os.path.exists(old_images_dir):
         tasks = collect_copy_tasks(old_images_dir, new_images_dir, image_exts)
-        print(f"  发现 {len(tasks)} 个文件...")
+        stats = execute_copy_tasks(tasks, workers, dry_run, mode)
+        print(f"  发现 {stats['total']} 个文件")
         
-        if tasks:
-            stats = execute_copy_tasks(tasks, workers, dry_run)
+        if stats['total']:
             total_stats['images'] = stats['copied']
             total_stats['skipped'] += stats['skipped']
             total_stats['errors'] += stats['errors']
@@ -326,10 +420,10 @@ def migrate_all(cache_dir: str, workers: int = 8, dry_run: bool = False):
     
     if os.path.exists(old_videos_dir):
         tasks = collect_copy_tasks(old_videos_dir, new_videos_dir, video_exts)
-        print(f"  发现 {len(tasks)} 个文件...")
+        stats = execute_copy_tasks(tasks, workers, dry_run, mode)
+        print(f"  发现 {stats['total']} 个文件")
         
-        if tasks:
-            stats = execute_copy_tasks(tasks, workers, dry_run)
+        if stats['total']:
             total_stats['videos'] = stats['copied']
             total_stats['skipped'] += stats['skipped']
             total_stats['errors'] += stats['errors']
@@ -386,6 +480,9 @@ def main():
   
   # 默认 8 个线程执行迁移
   python scripts/migrate_cache.py --cache-dir /nas/cache
+  
+  # 迁移后不保留旧目录（移动文件）
+  python scripts/migrate_cache.py --cache-dir /nas/cache --mode move
         """
     )
     
@@ -402,6 +499,14 @@ def main():
         help='并发线程数 (默认: 8)'
     )
     
+    parser.add_argument(
+        '--mode',
+        choices=MIGRATE_MODES,
+        default=DEFAULT_MIGRATE_MODE,
+        help='迁移方式: hardlink 图片/视频硬链接、任务文件复制，保留旧目录; move 移动文件; '
+             'copy 复制文件 (默认: hardlink，跨文件系统时自动回退为复制)'
+    )
+    
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -417,7 +522,7 @@ def main():
         print(f"错误: 缓存目录不存在: {cache_dir}")
         sys.exit(1)
     
-    migrate_all(cache_dir, args.workers, args.dry_run)
+    migrate_all(cache_dir, args.workers, args.dry_run, args.mode)
 
 
 if __name__ == '__main__':
@@ -7,6 +7,9 @@ from typing import Dict, Optional
 class AudioService:
     """音频上传服务，用于获取DashScope OSS临时URL"""
     
+    # 音频文件大小上限 (15MB)
+    MAX_AUDIO_SIZE = 15 * 1024 * 1024
+    
     def __init__(self, api_key: str):
         """初始化音频服务
         
@@ -181,8 +184,7 @@ class AudioService:
         
         # 检查文件大小 (最大15MB)
         file_size = os.path.getsize(file_path)
-        max_size = 15 * 1024 * 1024  # 15MB
-        if file_size > max_size:
+        if file_size > self.MAX_AUDIO_SIZE:
             return False, f"文件大小超过限制(最大15MB)，当前: {file_size / 1024 / 1024:.2f}MB"
         
         # 检查文件格式
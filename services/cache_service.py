@@ -1,12 +1,15 @@
 import os
 import json
 import hashlib
-import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Dict, List, Optional
 import requests
 import time
 from config import Config
+from core.handlers.media_handler import MediaHandler
 
 
 class CacheService:
@@ -14,6 +17,26 @@ class CacheService:
     
     # 类级别的HTTP会话池(用于视频下载)
     _session = None
+    
+    # 类级别的下载线程池(用于文生图多图并发下载，跨请求复用)
+    # 线程按需创建，类定义时不会启动任何线程
+    _download_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='t2i-download')
+    
+    # 类级别的已确认存在的目录集合(避免每次请求重复 makedirs)
+    _ensured_dirs = set()
+    _ensured_dirs_lock = threading.Lock()
+    
+    # 类级别的视频下载线程池及进行中的任务集合(状态轮询时后台下载，避免阻塞请求)
+    _video_download_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='t2v-download')
+    _downloading_videos = set()
+    _downloading_lock = threading.Lock()
+    
+    # 类级别的缩略图列表缓存: (task_type, api_key_hash, page, limit) -> (payload, timestamp)
+    # 只缓存全部任务已结束的分页；新增/更新任务时失效。多进程部署下其他进程依赖TTL过期
+    _thumbnail_cache = {}
+    _thumbnail_cache_lock = threading.Lock()
+    _thumbnail_cache_ttl = int(os.getenv('THUMBNAIL_CACHE_TTL', '10'))
+    _thumbnail_cache_size = 1024
 
     def __init__(self, api_key_hash: str):
         """初始化缓存服务
@@ -34,6 +57,15 @@ class CacheService:
             CacheService._session.mount('http://', adapter)
             CacheService._session.mount('https://', adapter)
 
+    @staticmethod
+    def _ensure_dir(path: str):
+        """确保目录存在，同一进程内每个目录只创建一次"""
+        if path in CacheService._ensured_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        with CacheService._ensured_dirs_lock:
+            CacheService._ensured_dirs.add(path)
+
     def get_user_cache_file(self) -> str:
         """获取用户缓存文件路径 (deprecated)"""
         return os.path.join(Config.CACHE_DIR, f'user_{self.api_key_hash}.json')
@@ -43,31 +75,31 @@ class CacheService:
     def get_upload_i2v_dir(self) -> str:
         """获取图生视频上传图片目录"""
         upload_dir = os.path.join(Config.UPLOAD_I2V_DIR, self.api_key_hash)
-        os.makedirs(upload_dir, exist_ok=True)
+        CacheService._ensure_dir(upload_dir)
         return upload_dir
     
     def get_upload_kf2v_dir(self) -> str:
         """获取首尾帧上传图片目录"""
         upload_dir = os.path.join(Config.UPLOAD_KF2V_DIR, self.api_key_hash)
-        os.makedirs(upload_dir, exist_ok=True)
+        CacheService._ensure_dir(upload_dir)
         return upload_dir
     
     def get_upload_i2i_dir(self) -> str:
         """获取图生图参考图片目录"""
         upload_dir = os.path.join(Config.UPLOAD_I2I_DIR, self.api_key_hash)
-        os.makedirs(upload_dir, exist_ok=True)
+        CacheService._ensure_dir(upload_dir)
         return upload_dir
     
     def get_upload_r2v_dir(self) -> str:
         """获取参考生视频上传视频目录"""
         upload_dir = os.path.join(Config.UPLOAD_R2V_DIR, self.api_key_hash)
-        os.makedirs(upload_dir, exist_ok=True)
+        CacheService._ensure_dir(upload_dir)
         return upload_dir
     
     def get_upload_audio_dir(self) -> str:
         """获取音频文件目录"""
         upload_dir = os.path.join(Config.UPLOAD_AUDIO_DIR, self.api_key_hash)
-        os.makedirs(upload_dir, exist_ok=True)
+        CacheService._ensure_dir(upload_dir)
         return upload_dir
 
     # ========== 输出目录获取方法 ==========
@@ -75,37 +107,37 @@ class CacheService:
     def get_output_i2v_dir(self) -> str:
         """获取图生视频输出目录"""
         output_dir = os.path.join(Config.OUTPUT_I2V_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
     
     def get_output_kf2v_dir(self) -> str:
         """获取首尾帧输出目录"""
         output_dir = os.path.join(Config.OUTPUT_KF2V_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
     
     def get_output_t2i_dir(self) -> str:
         """获取文生图输出目录"""
         output_dir = os.path.join(Config.OUTPUT_T2I_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
     
     def get_output_i2i_dir(self) -> str:
         """获取图生图输出目录"""
         output_dir = os.path.join(Config.OUTPUT_I2I_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
     
     def get_output_r2v_dir(self) -> str:
         """获取参考生视频输出目录"""
         output_dir = os.path.join(Config.OUTPUT_R2V_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
 
     def get_output_t2v_dir(self) -> str:
         """获取文生视频输出目录"""
         output_dir = os.path.join(Config.OUTPUT_T2V_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
 
     # ========== 兼容旧方法 (deprecated) ==========
@@ -741,33 +773,78 @@ class CacheService:
     
     def add_t2i_task(self, task_data: Dict):
         """添加文生图任务记录"""
-        task_data['created_at'] = datetime.now().isoformat()
-        task_data['task_type'] = 't2i'
+        self.add_t2i_tasks_batch([task_data])
+    
+    def add_t2i_tasks_batch(self, tasks: List[Dict]):
+        """批量添加文生图任务记录
         
-        task_id = task_data.get('task_id')
-        if not task_id:
-            print("[ERROR] 文生图任务ID为空，无法保存")
+        同一批次的任务一次性写入，目录创建与缓存失效只执行一次。
+        后台任务可能在记录写入前就已完成并通过 update_t2i_task 建立了记录，
+        此时与已有记录合并，保留后台写入的状态
+        
+        Args:
+            tasks: 任务信息列表
+        """
+        if not tasks:
             return
         
         tasks_dir = os.path.join(Config.TASK_T2I_DIR, self.api_key_hash)
         os.makedirs(tasks_dir, exist_ok=True)
         
-        task_file = os.path.join(tasks_dir, f"{task_id}.json")
-        try:
-            with open(task_file, 'w', encoding='utf-8') as f:
-                json.dump(task_data, f, ensure_ascii=False, indent=2)
-            print(f"[INFO] 文生图任务文件已保存: {task_file}")
-        except Exception as e:
-            print(f"[ERROR] 保存文生图任务文件失败: {e}")
+        created_at = datetime.now().isoformat()
+        saved = 0
+        for task_data in tasks:
+            task_id = task_data.get('task_id')
+            if not task_id:
+                print("[ERROR] 文生图任务ID为空，无法保存")
+                continue
+            
+            task_data['created_at'] = created_at
+            task_data['task_type'] = 't2i'
+            
+            task_file = os.path.join(tasks_dir, f"{task_id}.json")
+            try:
+                try:
+                    f = open(task_file, 'x', encoding='utf-8')
+                except FileExistsError:
+                    with open(task_file, 'r', encoding='utf-8') as existing_file:
+                        existing = json.load(existing_file)
+                    f = open(task_file, 'w', encoding='utf-8')
+                    task_data = {**task_data, **existing}
+                with f:
+                    json.dump(task_data, f, ensure_ascii=False, indent=2)
+                saved += 1
+            except Exception as e:
+                print(f"[ERROR] 保存文生图任务文件失败: {task_id}, {e}")
+        
+        print(f"[INFO] 文生图任务文件已保存: {saved}/{len(tasks)}")
+        self._invalidate_thumbnails('t2i')
     
     def update_t2i_task(self, task_id: str, update_data: Dict):
-        """更新文生图任务状态"""
+        """更新文生图任务状态
+        
+        任务记录尚未写入时（后台任务先于创建请求完成）新建记录，
+        之后写入的创建信息会与之合并，避免状态更新丢失
+        """
         tasks_dir = os.path.join(Config.TASK_T2I_DIR, self.api_key_hash)
         task_file = os.path.join(tasks_dir, f"{task_id}.json")
         
         if not os.path.exists(task_file):
-            print(f"[WARN] 文生图任务文件不存在: {task_file}")
-            return
+            task_data = {'task_id': task_id, 'task_type': 't2i', **update_data}
+            task_data['updated_at'] = datetime.now().isoformat()
+            try:
+                os.makedirs(tasks_dir, exist_ok=True)
+                with open(task_file, 'x', encoding='utf-8') as f:
+                    json.dump(task_data, f, ensure_ascii=False, indent=2)
+                print(f"[INFO] 文生图任务记录尚未创建，已先写入状态: {task_id}")
+                self._invalidate_thumbnails('t2i')
+                return
+            except FileExistsError:
+                # 创建请求刚好写入了记录，按正常流程更新
+                pass
+            except Exception as e:
+                print(f"[ERROR] 更新文生图任务失败: {e}")
+                return
         
         try:
             with open(task_file, 'r', encoding='utf-8') as f:
@@ -780,6 +857,7 @@ class CacheService:
                 json.dump(task_data, f, ensure_ascii=False, indent=2)
                 
             print(f"[INFO] 文生图任务已更新: {task_id}")
+            self._invalidate_thumbnails('t2i')
         except Exception as e:
             print(f"[ERROR] 更新文生图任务失败: {e}")
     
@@ -876,7 +954,7 @@ class CacheService:
             return [], 0, False
     
     def download_t2i_images(self, task_id: str, image_urls: List[str], max_retries: int = 3) -> List[str]:
-        """下载文生图生成的图片到本地
+        """下载文生图生成的图片到本地（串行）
         
         Args:
             task_id: 任务ID
@@ -886,72 +964,121 @@ class CacheService:
         Returns:
             本地图片文件名列表
         """
-        # 文生图输出目录
         output_dir = self.get_output_t2i_dir()
+        results = [
+            self._download_t2i_image(task_id, idx, image_url, output_dir, max_retries)
+            for idx, image_url in enumerate(image_urls)
+        ]
+        return [filename for filename in results if filename]
+    
+    def download_t2i_images_parallel(self, task_id: str, image_urls: List[str], max_retries: int = 3) -> List[str]:
+        """并发下载文生图生成的图片到本地
         
-        local_filenames = []
+        多张图片同时下载，总耗时取决于最慢的一张而不是所有图片之和
         
-        for idx, image_url in enumerate(image_urls):
-            # 生成本地文件名
-            filename = f"{task_id}_{idx}.jpg"
-            image_path = os.path.join(output_dir, filename)
+        Args:
+            task_id: 任务ID
+            image_urls: 图片URL列表
+            max_retries: 最大重试次数
             
-            # 如果已经下载过，直接添加到列表
-            if os.path.exists(image_path):
-                print(f"[INFO] 文生图图片已存在: {image_path}")
-                local_filenames.append(filename)
-                continue
+        Returns:
+            本地图片文件名列表（与 image_urls 顺序一致）
+        """
+        if len(image_urls) <= 1:
+            return self.download_t2i_images(task_id, image_urls, max_retries)
+        
+        output_dir = self.get_output_t2i_dir()
+        
+        futures = {
+            CacheService._download_executor.submit(
+                self._download_t2i_image, task_id, idx, image_url, output_dir, max_retries
+            ): idx
+            for idx, image_url in enumerate(image_urls)
+        }
+        
+        results = {}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                print(f"[ERROR] 下载文生图图片异常: {task_id}_{idx}, {e}")
+                results[idx] = None
+        
+        return [results[idx] for idx in range(len(image_urls)) if results.get(idx)]
+    
+    def _download_t2i_image(self, task_id: str, idx: int, image_url: str, output_dir: str,
+                            max_retries: int = 3) -> Optional[str]:
+        """下载单张文生图图片（带重试）
+        
+        Args:
+            task_id: 任务ID
+            idx: 图片序号
+            image_url: 图片URL
+            output_dir: 输出目录
+            max_retries: 最大重试次数
             
-            # 重试下载
-            for attempt in range(max_retries):
-                try:
-                    print(f"[INFO] 开始下载文生图图片 (第{attempt + 1}/{max_retries}次尝试): {task_id}_{idx}")
-                    response = self._session.get(image_url, stream=True, timeout=60)
-                    
-                    # 如果是404错误,等待后重试
-                    if response.status_code == 404:
-                        if attempt < max_retries - 1:
-                            wait_time = 2
-                            print(f"[WARN] 图片URL返回404,等待{wait_time}秒后重试...")
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            print(f"[ERROR] 图片URL持续404,下载失败: {task_id}_{idx}")
-                            break
-                    
-                    response.raise_for_status()
-                    
-                    # 临时文件
-                    temp_path = f"{image_path}.tmp"
-                    
-                    with open(temp_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                    
-                    # 下载成功，重命名
-                    os.rename(temp_path, image_path)
-                    print(f"[INFO] 文生图图片下载成功: {image_path}")
-                    local_filenames.append(filename)
-                    break
-                    
-                except Exception as e:
-                    print(f"[ERROR] 下载文生图图片失败 (第{attempt + 1}/{max_retries}次): {e}")
-                    
-                    # 删除临时文件
-                    temp_path = f"{image_path}.tmp"
-                    if os.path.exists(temp_path):
-                        try:
-                            os.remove(temp_path)
-                        except:
-                            pass
-                    
+        Returns:
+            本地文件名，失败返回None
+        """
+        # 生成本地文件名
+        filename = f"{task_id}_{idx}.jpg"
+        image_path = os.path.join(output_dir, filename)
+        
+        # 如果已经下载过，直接返回
+        if os.path.exists(image_path):
+            print(f"[INFO] 文生图图片已存在: {image_path}")
+            return filename
+        
+        # 重试下载
+        for attempt in range(max_retries):
+            try:
+                print(f"[INFO] 开始下载文生图图片 (第{attempt + 1}/{max_retries}次尝试): {task_id}_{idx}")
+                response = self._session.get(image_url, stream=True, timeout=60)
+                
+                # 如果是404错误,等待后重试
+                if response.status_code == 404:
                     if attempt < max_retries - 1:
-                        wait_time = (attempt + 1) * 2
-                        print(f"[INFO] 等待{wait_time}秒后重试...")
+                        wait_time = 2
+                        print(f"[WARN] 图片URL返回404,等待{wait_time}秒后重试...")
                         time.sleep(wait_time)
+                        continue
+                    else:
+                        print(f"[ERROR] 图片URL持续404,下载失败: {task_id}_{idx}")
+                        return None
+                
+                response.raise_for_status()
+                
+                # 临时文件
+                temp_path = f"{image_path}.tmp"
+                
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                
+                # 下载成功，重命名
+                os.rename(temp_path, image_path)
+                print(f"[INFO] 文生图图片下载成功: {image_path}")
+                return filename
+                
+            except Exception as e:
+                print(f"[ERROR] 下载文生图图片失败 (第{attempt + 1}/{max_retries}次): {e}")
+                
+                # 删除临时文件
+                temp_path = f"{image_path}.tmp"
+                if os.path.exists(temp_path):
+                    try:
+                        os.remove(temp_path)
+                    except:
+                        pass
+                
+                if attempt < max_retries - 1:
+                    wait_time = (attempt + 1) * 2
+                    print(f"[INFO] 等待{wait_time}秒后重试...")
+                    time.sleep(wait_time)
         
-        return local_filenames
+        return None
     
     # ========== 图生图任务管理 ==========
     
@@ -1307,46 +1434,9 @@ class CacheService:
             print(f"[WARN] 视频文件不存在，无法生成封面: {task_id}")
             return None
         
-        try:
-            # 使用 ffmpeg 提取第0.5秒的帧作为封面
-            # -ss 0.5: 跳到0.5秒位置
-            # -vframes 1: 只提取1帧
-            # -q:v 2: 高质量JPEG (1-31, 越小越好)
-            # -vf scale=-1:360: 缩放高度为360px，宽度自适应（减小文件体积）
-            cmd = [
-                'ffmpeg',
-                '-ss', '0.5',
-                '-i', video_path,
-                '-vframes', '1',
-                '-vf', 'scale=-1:360',
-                '-q:v', '3',
-                '-y',  # 覆盖已存在的文件
-                poster_path
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                timeout=30  # 30秒超时
-            )
-            
-            if result.returncode == 0 and os.path.exists(poster_path):
-                print(f"[INFO] 视频封面生成成功: {poster_path}")
-                return poster_path
-            else:
-                error_msg = result.stderr.decode('utf-8', errors='ignore')
-                print(f"[ERROR] ffmpeg生成封面失败: {error_msg[:200]}")
-                return None
-                
-        except subprocess.TimeoutExpired:
-            print(f"[ERROR] 生成封面超时: {task_id}")
-            return None
-        except FileNotFoundError:
-            print("[ERROR] ffmpeg未安装，请先安装ffmpeg")
-            return None
-        except Exception as e:
-            print(f"[ERROR] 生成封面异常: {e}")
-            return None
+        if MediaHandler.generate_video_poster(video_path, poster_path):
+            return poster_path
+        return None
     
     def get_or_generate_poster(self, task_id: str, video_path: str = None, task_type: str = None) -> Optional[str]:
         """获取封面图，如果不存在则生成
@@ -1538,17 +1628,22 @@ class CacheService:
             with open(task_file, 'w', encoding='utf-8') as f:
                 json.dump(task_data, f, ensure_ascii=False, indent=2)
             print(f"[INFO] 文生视频任务文件已保存: {task_file}")
+            self._invalidate_thumbnails('t2v')
         except Exception as e:
             print(f"[ERROR] 保存文生视频任务文件失败: {e}")
     
-    def update_t2v_task(self, task_id: str, update_data: Dict):
-        """更新文生视频(T2V)任务状态"""
+    def update_t2v_task(self, task_id: str, update_data: Dict) -> Optional[Dict]:
+        """更新文生视频(T2V)任务状态
+        
+        Returns:
+            更新后的完整任务数据，任务不存在或更新失败时返回None
+        """
         tasks_dir = os.path.join(Config.TASK_T2V_DIR, self.api_key_hash)
         task_file = os.path.join(tasks_dir, f"{task_id}.json")
         
         if not os.path.exists(task_file):
             print(f"[WARN] 文生视频任务文件不存在: {task_file}")
-            return
+            return None
         
         try:
             # 读取现有任务数据
@@ -1564,8 +1659,11 @@ class CacheService:
                 json.dump(task_data, f, ensure_ascii=False, indent=2)
                 
             print(f"[INFO] 文生视频任务已更新: {task_id}")
+            self._invalidate_thumbnails('t2v')
+            return task_data
         except Exception as e:
             print(f"[ERROR] 更新文生视频任务失败: {e}")
+            return None
     
     def get_t2v_task(self, task_id: str) -> Optional[Dict]:
         """获取单个文生视频(T2V)任务信息"""
@@ -1659,6 +1757,39 @@ class CacheService:
             print(f"[ERROR] 分页获取文生视频任务失败: {e}")
             return [], 0, False
     
+    def download_t2v_video_background(self, task_id: str, video_url: str) -> Optional[str]:
+        """在后台线程下载文生视频，不阻塞调用方
+        
+        同一任务并发轮询时只会提交一次下载；重试耗尽仍失败时在任务记录中
+        写入 download_state='failed'，调用方据此停止重复下载
+        
+        Args:
+            task_id: 任务ID
+            video_url: 视频URL
+            
+        Returns:
+            视频已在本地时返回文件路径，否则提交后台下载并返回None
+        """
+        video_path = os.path.join(self.get_output_t2v_dir(), f'{task_id}.mp4')
+        if os.path.exists(video_path):
+            return video_path
+        
+        with CacheService._downloading_lock:
+            if task_id in CacheService._downloading_videos:
+                return None
+            CacheService._downloading_videos.add(task_id)
+        
+        def run():
+            try:
+                if self.download_t2v_video(task_id, video_url) is None:
+                    self.update_t2v_task(task_id, {'download_state': 'failed'})
+            finally:
+                with CacheService._downloading_lock:
+                    CacheService._downloading_videos.discard(task_id)
+        
+        CacheService._video_download_executor.submit(run)
+        return None
+    
     def download_t2v_video(self, task_id: str, video_url: str, max_retries: int = 3) -> Optional[str]:
         """下载文生视频生成的视频到本地,支持404重试
         
@@ -1679,6 +1810,7 @@ class CacheService:
             return video_path
 
         # 重试下载,支持404重试
+        temp_path = None
         for attempt in range(max_retries):
             try:
                 print(f"[INFO] 开始下载文生视频 (第{attempt + 1}/{max_retries}次尝试): {task_id}")
@@ -1697,16 +1829,16 @@ class CacheService:
                 
                 response.raise_for_status()
 
-                # 临时文件，下载成功后再重命名
-                temp_path = f"{video_path}.tmp"
-                
-                with open(temp_path, 'wb') as f:
+                # 唯一命名的临时文件，多进程同时下载同一任务时互不覆盖；下载成功后再重命名
+                fd, temp_path = tempfile.mkstemp(dir=video_dir, prefix=f'{task_id}.', suffix='.mp4.tmp')
+                with os.fdopen(fd, 'wb') as f:
                     for chunk in response.iter_content(chunk_size=8192):
                         if chunk:
                             f.write(chunk)
 
                 # 下载成功，重命名
-                os.rename(temp_path, video_path)
+                os.replace(temp_path, video_path)
+                temp_path = None
                 print(f"[INFO] 文生视频下载成功: {video_path}")
                 return video_path
                 
@@ -1714,12 +1846,12 @@ class CacheService:
                 print(f"[ERROR] 下载文生视频失败 (第{attempt + 1}/{max_retries}次): {e}")
                 
                 # 删除临时文件
-                temp_path = f"{video_path}.tmp"
-                if os.path.exists(temp_path):
+                if temp_path:
                     try:
                         os.remove(temp_path)
-                    except:
+                    except OSError:
                         pass
+                    temp_path = None
                 
                 # 如果不是最后一次尝试，等待一下再重试
                 if attempt < max_retries - 1:
@@ -1730,6 +1862,57 @@ class CacheService:
         print(f"[ERROR] 文生视频下载失败，已达最大重试次数: {task_id}")
         return None
 
+    # ========== 缩略图列表缓存 ==========
+    
+    def get_cached_thumbnails(self, task_type: str, page: int, limit: int) -> Optional[Dict]:
+        """获取缓存的缩略图列表响应数据
+        
+        Args:
+            task_type: 任务类型，t2i/t2v
+            page: 页码
+            limit: 每页数量
+            
+        Returns:
+            响应数据字典，未命中或已过期返回None
+        """
+        key = (task_type, self.api_key_hash, page, limit)
+        with CacheService._thumbnail_cache_lock:
+            cached = CacheService._thumbnail_cache.get(key)
+            if cached:
+                payload, timestamp = cached
+                if time.time() - timestamp < CacheService._thumbnail_cache_ttl:
+                    return payload
+                del CacheService._thumbnail_cache[key]
+        return None
+    
+    def cache_thumbnails(self, task_type: str, page: int, limit: int, tasks: List[Dict], payload: Dict):
+        """缓存缩略图列表响应数据
+        
+        分页中仍有未结束的任务时不缓存，避免轮询拿不到最新状态
+        
+        Args:
+            task_type: 任务类型，t2i/t2v
+            page: 页码
+            limit: 每页数量
+            tasks: 该分页的原始任务列表
+            payload: 响应数据
+        """
+        if any(task.get('task_status') not in ('SUCCEEDED', 'FAILED') for task in tasks):
+            return
+        
+        with CacheService._thumbnail_cache_lock:
+            # 缓存满时淘汰最早写入的条目
+            if len(CacheService._thumbnail_cache) >= CacheService._thumbnail_cache_size:
+                del CacheService._thumbnail_cache[next(iter(CacheService._thumbnail_cache))]
+            CacheService._thumbnail_cache[(task_type, self.api_key_hash, page, limit)] = (payload, time.time())
+    
+    def _invalidate_thumbnails(self, task_type: str):
+        """清除当前用户指定类型的全部缩略图列表缓存"""
+        with CacheService._thumbnail_cache_lock:
+            for key in [k for k in CacheService._thumbnail_cache
+                        if k[0] == task_type and k[1] == self.api_key_hash]:
+                del CacheService._thumbnail_cache[key]
+    
     # ========== 任务索引缓存管理（性能优化）==========
     
     def get_task_index_file(self, task_type: str = 'i2v') -> str:
@@ -1952,13 +2135,13 @@ class CacheService:
     def get_upload_voice_dir(self) -> str:
         """获取语音样本上传目录"""
         upload_dir = os.path.join(Config.UPLOAD_VOICE_DIR, self.api_key_hash)
-        os.makedirs(upload_dir, exist_ok=True)
+        CacheService._ensure_dir(upload_dir)
         return upload_dir
     
     def get_output_voice_dir(self) -> str:
         """获取合成语音输出目录"""
         output_dir = os.path.join(Config.OUTPUT_VOICE_DIR, self.api_key_hash)
-        os.makedirs(output_dir, exist_ok=True)
+        CacheService._ensure_dir(output_dir)
         return output_dir
     
     def add_voice(self, voice_data: Dict):
@@ -4,8 +4,11 @@ import time
 import os
 import json
 import threading
+import traceback
+import uuid
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, Optional, List, Callable
 from functools import lru_cache
 from config import Config
@@ -21,6 +24,36 @@ _background_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix='qw
 # 后台任务回调注册表
 _task_callbacks: Dict[str, Callable] = {}
 
+# z-image-turbo 调用限流：同一API Key相邻两次API调用的最小间隔(秒)
+_Z_IMAGE_MIN_INTERVAL = 2
+_z_image_rate_lock = threading.Lock()
+_z_image_next_slot: Dict[str, float] = {}
+
+
+def _submit_z_image_task(api_key: str, fn: Callable):
+    """按API Key错峰提交z-image-turbo后台任务
+
+    为该Key预约下一个可用时间点；需要等待时由定时器到点后再提交到线程池，
+    等待期间不占用 _background_executor 的线程，不同Key之间互不影响
+    """
+    with _z_image_rate_lock:
+        now = time.monotonic()
+        # 清理已过期的预约，避免长期运行后字典无限增长
+        if len(_z_image_next_slot) > 256:
+            for key in [k for k, v in _z_image_next_slot.items() if v <= now]:
+                del _z_image_next_slot[key]
+        slot = max(now, _z_image_next_slot.get(api_key, 0.0))
+        _z_image_next_slot[api_key] = slot + _Z_IMAGE_MIN_INTERVAL
+    
+    delay = slot - now
+    if delay <= 0:
+        return _background_executor.submit(fn)
+    
+    timer = threading.Timer(delay, _background_executor.submit, args=(fn,))
+    timer.daemon = True
+    timer.start()
+    return timer
+
 
 class VideoService:
     """通义万相视频生成服务"""
@@ -48,7 +81,6 @@ class VideoService:
     def _get_or_create_session(cls) -> requests.Session:
         """获取或创建HTTP会话(连接池复用)"""
         # 使用线程安全的session池
-        import threading
         thread_id = threading.current_thread().ident
 
         if thread_id not in cls._session_pool:
@@ -313,7 +345,6 @@ class VideoService:
                 # OSS挂载目录可能需要等待文件同步
                 if not os.path.exists(image_path):
                     if attempt < max_retries - 1:
-                        import time
                         time.sleep(0.2 * (attempt + 1))
                         continue
                     else:
@@ -338,7 +369,6 @@ class VideoService:
 
             except Exception as e:
                 if attempt < max_retries - 1:
-                    import time
                     print(f"[WARN] 读取图片失败，第{attempt + 1}次重试: {e}")
                     time.sleep(0.2 * (attempt + 1))
                 else:
@@ -474,8 +504,6 @@ class VideoService:
             OSS临时URL（oss://开头），有效期48小时
         """
         try:
-            import os
-            from pathlib import Path
             
             # 1. 获取上传凭证
             url = "https://dashscope.aliyuncs.com/api/v1/uploads"
@@ -530,7 +558,6 @@ class VideoService:
             
         except Exception as e:
             print(f"[ERROR] 上传文件到DashScope失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
     
@@ -686,7 +713,18 @@ class VideoService:
         """从参数字典创建任务(供批量创建使用)"""
         task_type = params.get('task_type', 'i2v')
 
-        if task_type == 'kf2v':
+        if task_type == 't2v':
+            return self.create_t2v_task(
+                prompt=params['prompt'],
+                model=params.get('model', 'wan2.6-t2v'),
+                resolution=params.get('resolution', '720P'),
+                duration=params.get('duration', 5),
+                audio=params.get('audio', False),
+                audio_url=params.get('audio_url', ''),
+                negative_prompt=params.get('negative_prompt', ''),
+                shot_type=params.get('shot_type', 'single')
+            )
+        elif task_type == 'kf2v':
             return self.create_kf2v_task(
                 first_frame_path=params['first_frame_path'],
                 last_frame_path=params['last_frame_path'],
@@ -823,7 +861,6 @@ class VideoService:
             return None
         except Exception as e:
             print(f"[ERROR] 创建文生图任务失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
 
@@ -849,7 +886,6 @@ class VideoService:
         Returns:
             任务信息字典（PENDING状态）
         """
-        import uuid
         
         # 生成唯一任务ID
         task_id = f"wan26_{uuid.uuid4().hex[:16]}"
@@ -1012,7 +1048,6 @@ class VideoService:
             return None
         except Exception as e:
             print(f"[ERROR] 执行wan2.6-t2i API失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
 
@@ -1038,7 +1073,6 @@ class VideoService:
         Returns:
             任务信息字典（PENDING状态）
         """
-        import uuid
         
         # 生成唯一任务ID
         task_id = f"zimage_{uuid.uuid4().hex[:16]}"
@@ -1086,7 +1120,6 @@ class VideoService:
                     
             except Exception as e:
                 print(f"[ERROR] z-image-turbo后台任务执行失败: {task_id}, {e}")
-                import traceback
                 traceback.print_exc()
                 if callback:
                     callback(task_id, {
@@ -1094,9 +1127,9 @@ class VideoService:
                         'message': str(e)
                     })
         
-        # 提交到后台线程池
+        # 按API Key错峰提交到后台线程池
         print(f"[DEBUG] 提交z-image-turbo后台任务: {task_id}")
-        future = _background_executor.submit(execute_task)
+        future = _submit_z_image_task(self.api_key, execute_task)
         print(f"[DEBUG] 后台任务已提交: {task_id}, future={future}")
         
         return task_info
@@ -1113,7 +1146,6 @@ class VideoService:
         Returns:
             包含image_urls的结果字典
         """
-        import time
         
         for attempt in range(max_retries):
             try:
@@ -1231,7 +1263,6 @@ class VideoService:
             except Exception as e:
                 print(f"[ERROR] 执行z-image-turbo API失败: {e}")
                 if attempt >= max_retries - 1:
-                    import traceback
                     traceback.print_exc()
                     return None
                 else:
@@ -1287,7 +1318,6 @@ class VideoService:
             
         except Exception as e:
             print(f"[ERROR] 创建图生图任务失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
     
@@ -1296,7 +1326,6 @@ class VideoService:
                                       negative_prompt: str = '',
                                       callback: Callable = None) -> Optional[Dict]:
         """创建 qwen-image-edit-plus 任务（后台异步执行，每次生成1张图片）"""
-        import uuid
         
         # 生成临时任务ID
         task_id = f"qwen_{uuid.uuid4().hex[:16]}"
@@ -1474,7 +1503,6 @@ class VideoService:
             return None
         except Exception as e:
             print(f"[ERROR] 创建qwen-image-edit-plus任务失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
     
@@ -1567,7 +1595,6 @@ class VideoService:
             return None
         except Exception as e:
             print(f"[ERROR] 创建图生图任务失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
 
@@ -1820,6 +1847,21 @@ class VideoService:
             return None
         except Exception as e:
             print(f"[ERROR] 创建wan2.6-image任务失败: {e}")
-            import traceback
             traceback.print_exc()
             return None
+
+
+@lru_cache(maxsize=1024)
+def get_video_service(api_key: str) -> VideoService:
+    """按 API Key 复用 VideoService 实例
+
+    同一用户的请求共用实例及其HTTP会话，轮询时可复用与DashScope的keep-alive连接，
+    避免每次请求重新建立TCP/TLS连接；LRU淘汰长期不活跃的用户
+
+    Args:
+        api_key: DashScope API Key
+
+    Returns:
+        VideoService 实例
+    """
+    return VideoService(api_key)